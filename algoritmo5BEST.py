@@ -1,38 +1,49 @@
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import GridSearchCV
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
-from sklearn.pipeline import Pipeline
 import numpy as np
 import os
+from data_layer import load_dataset, load_window, materialize_partitions, save_predictions
+from backtest import N_WORKERS, run_backtest
+from race_cv import RaceTimeSeriesSplit, drop_tree_invariant_steps, fold_preprocessing_cache, race_order
+from model_cache import cache_key, load_model, register_season, save_model
+from hyperparameter_search import FIT_BUDGET, load_warm_start, save_report, search_best_model
+from model_backends import DEFAULT_BACKEND, keeps_missing, make_backend
+from ranking import compare_rankers, rank_within_races
+from scoring import points_for_positions
+from season_simulator import prediction_spread
+from feature_store import FEATURE_COLUMNS, FEATURE_STORE_PATH, load_features, snapshot_covers, stored_features
+from feature_stream import load_feature_frame
+from instrumentation import enable_profiling, stage, summarize_run, timed
 
-# Carica i dati
-data = pd.read_csv('final_data_sorted.csv')
+# Funzione per aggiornare lo store delle caratteristiche leggendo solo le colonne usate dalle medie mobili
+@timed('features')
+def update_feature_store(store_path=FEATURE_STORE_PATH):
+    load_features(load_dataset(columns=['resultId', 'driverId', 'grid', 'positionOrder']), store_path)
 
-# Verifica delle colonne
-expected_columns = ['driverId', 'grid', 'positionOrder', 'year', 'constructorId']
-missing_columns = [col for col in expected_columns if col not in data.columns]
+# Modello usato per le predizioni: 'random_forest' o 'hist_gb' (griglie in model_backends.py)
+MODEL_BACKEND = DEFAULT_BACKEND
 
-if missing_columns:
-    raise KeyError(f"Le seguenti colonne mancano nel DataFrame: {missing_columns}")
+# Colonne del dataset lette per ogni stagione: quelle usate per addestrare e prevedere (year e round danno
+# l'ordine delle gare per la cross-validation) e quelle lette dagli script che analizzano le predizioni
+SEASON_COLUMNS = ['raceId', 'raceName', 'year', 'round', 'resultId', 'driverId', 'driverForename', 'driverSurname',
+                  'constructorId', 'constructorName', 'grid', 'positionOrder', 'raceStatus']
 
-# Funzione per calcolare le caratteristiche aggiuntive
-def calculate_additional_features(data):
-    data['previous_position'] = data.groupby('driverId')['positionOrder'].shift(1)
-    data['avg_last_10_positions'] = data.groupby('driverId')['positionOrder'].transform(lambda x: x.rolling(10, min_periods=1).mean())
-    
-    # Posizioni guadagnate o perse rispetto alla griglia
-    data['positions_gained'] = data['grid'] - data['positionOrder']
-    data['avg_positions_gained'] = data.groupby('driverId')['positions_gained'].transform(lambda x: x.rolling(10, min_periods=1).mean())
-    
-    # Riempi i valori NaN con 0 o altre strategie appropriate
-    data.fillna(0, inplace=True)
+# Funzione per caricare solo le stagioni della finestra di un anno (5 anni di training + anno di test),
+# prendendo le caratteristiche già calcolate dallo store invece di ricalcolarle su tutta la storia.
+# Se lo snapshot manca o non copre la finestra, le medie mobili vengono calcolate con la pipeline in streaming.
+# I valori mancanti vengono riempiti con 0, tranne per i backend che li gestiscono da soli
+@timed('load', rows=len, season='year')
+def load_season_data(year, store_path=FEATURE_STORE_PATH, backend=MODEL_BACKEND):
+    fill_missing = not keeps_missing(backend)
+    data = load_window(year - 5, year, columns=SEASON_COLUMNS)
+    if not snapshot_covers(data['resultId'], store_path):
+        print(f"Anno {year}: lo store '{store_path}' non copre la finestra, caratteristiche calcolate in streaming.")
+        return load_feature_frame(year - 5, year, columns=SEASON_COLUMNS, fill_missing=fill_missing)
+    features = stored_features(data['resultId'], store_path)
+    for col in FEATURE_COLUMNS:
+        data[col] = features[col].to_numpy()
+    if fill_missing:
+        data.fillna(0, inplace=True)
     return data
 
-# Applica la funzione per calcolare le caratteristiche aggiuntive
-data = calculate_additional_features(data)
-
 # Funzione per preparare i dati per un anno specifico
 def prepare_data_for_year(data, year):
     train_data = data[(data['year'] >= year - 5) & (data['year'] < year)]
@@ -42,103 +53,151 @@ def prepare_data_for_year(data, year):
     
     return train_data, test_data
 
+# Feature usate dal modello
+MODEL_FEATURES = ['grid', 'previous_position', 'avg_last_10_positions', 'avg_positions_gained']
+
 # Funzione per creare le feature e le etichette
 def create_features_and_labels(data, target_col):
-    features = data[['grid', 'previous_position', 'avg_last_10_positions', 'avg_positions_gained']]
+    features = data[MODEL_FEATURES]
     labels = data[target_col]
     return features, labels
 
-# Funzione per addestrare e prevedere con un modello
-def train_and_predict(train_data, test_data, target_col):
+# Strategia di ricerca degli iperparametri: 'exhaustive', 'random' o 'halving'
+SEARCH_STRATEGY = 'exhaustive'
+
+# Cross-validation temporale raggruppata per gara (si valida sempre su gare successive al training)
+CV_SPLITTER = RaceTimeSeriesSplit(n_splits=5)
+
+# Se True la standardizzazione viene rimossa, perché non cambia le predizioni della RandomForest
+SKIP_TREE_INVARIANT_TRANSFORMS = False
+
+# Se True la fase più lenta di ogni esecuzione viene profilata con cProfile (slowest_stage.prof)
+PROFILE_STAGES = False
+
+# Se True ogni stagione addestra anche un modello learning-to-rank a coppie e lo confronta con il regressore
+TRAIN_RANKER = False
+
+# Funzione per addestrare il modello su una finestra di training: ricerca degli iperparametri
+# e addestramento finale, oppure caricamento dalla cache se la stessa ricerca è già stata eseguita
+def fit_model(train_data, target_col, strategy=SEARCH_STRATEGY, warm_start=None, season=None, backend=MODEL_BACKEND):
     X_train, y_train = create_features_and_labels(train_data, target_col)
-    X_test, _ = create_features_and_labels(test_data, target_col)
     
-    # Pipeline per preprocessamento e modello
-    pipeline = Pipeline([
-        ('imputer', SimpleImputer(strategy='mean')),  # Imputazione dei valori mancanti
-        ('scaler', StandardScaler()),  # Standardizzazione delle feature
-        ('model', RandomForestRegressor())  # Modello di RandomForest
-    ])
-    
-    # Definizione della griglia di iperparametri per la grid search
-    param_grid = {
-        'model__n_estimators': [100, 200],
-        'model__max_features': ['sqrt', 'log2'],
-        'model__max_depth': [10, 20, 30],
-        'model__min_samples_split': [2, 5],
-        'model__min_samples_leaf': [1, 2]
-    }
-    
-    # Implementazione della grid search con cross-validation
-    grid_search = GridSearchCV(pipeline, param_grid, cv=5, scoring='neg_mean_squared_error')
-    grid_search.fit(X_train, y_train)
-    
-    # Miglior modello trovato dalla grid search
-    best_model = grid_search.best_estimator_
-    y_pred = best_model.predict(X_test)
-    
-    return y_pred
-
-# Calcolo dei punti in base alla posizione predetta
-def calculate_points(position):
-    if position == 1:
-        return 25
-    elif position == 2:
-        return 18
-    elif position == 3:
-        return 15
-    elif position == 4:
-        return 12
-    elif position == 5:
-        return 10
-    elif position == 6:
-        return 8
-    elif position == 7:
-        return 6
-    elif position == 8:
-        return 4
-    elif position == 9:
-        return 2
-    elif position == 10:
-        return 1
-    else:
-        return 0
+    # Pipeline per preprocessamento e modello, e griglia di iperparametri del backend scelto
+    pipeline, param_grid = make_backend(backend)
+    if SKIP_TREE_INVARIANT_TRANSFORMS:
+        pipeline = drop_tree_invariant_steps(pipeline)
+    
+    # Se la stessa finestra di training è già stata addestrata con la stessa configurazione,
+    # il modello viene caricato dalla cache invece di ripetere la ricerca
+    key = cache_key(X_train, y_train, {'pipeline': repr(pipeline), 'param_grid': param_grid, 'strategy': strategy,
+                                       'fit_budget': FIT_BUDGET, 'warm_start': warm_start, 'cv': repr(CV_SPLITTER)})
+    with stage('load_model', season=season):
+        cached = load_model(key)
+    if cached is not None:
+        return cached['model'], dict(cached['metadata'], cached=True, cache_key=key)
+    
+    # Ricerca degli iperparametri con cross-validation temporale; il preprocessamento
+    # di ogni fold viene addestrato una sola volta e riutilizzato per tutti i candidati
+    with stage('search', season=season, rows=len(X_train)), fold_preprocessing_cache(pipeline):
+        best_model, search_info = search_best_model(pipeline, param_grid, X_train, y_train, strategy=strategy,
+                                                    fit_budget=FIT_BUDGET, cv=CV_SPLITTER, warm_start=warm_start,
+                                                    groups=race_order(train_data))
+    save_model(key, best_model, search_info)
+    return best_model, dict(search_info, cached=False, cache_key=key)
 
-# Predizione per ogni anno dal 2018 al 2023
-predictions = []
-years = range(2018, 2024)
+# Funzione per addestrare e prevedere con un modello
+def train_and_predict(train_data, test_data, target_col, strategy=SEARCH_STRATEGY, warm_start=None, season=None,
+                      backend=MODEL_BACKEND):
+    X_test, _ = create_features_and_labels(test_data, target_col)
+    best_model, search_info = fit_model(train_data, target_col, strategy=strategy, warm_start=warm_start,
+                                        season=season, backend=backend)
+    with stage('predict', season=season, rows=len(X_test)):
+        y_pred = best_model.predict(X_test)
+        
+        # Dispersione delle predizioni tra gli alberi, usata dalla simulazione delle stagioni
+        y_std = prediction_spread(best_model, X_test)
+    
+    return y_pred, y_std, search_info
 
-for year in years:
+# Funzione per prevedere una stagione addestrando sui 5 anni precedenti.
+# Se data è None la finestra viene letta dalle partizioni per stagione
+def predict_season(data, year):
+    if data is None:
+        data = load_season_data(year)
+    
     train_data, test_data = prepare_data_for_year(data, year)
     
     if train_data.empty or test_data.empty:
         print(f'Anno {year}: dati insufficienti per addestramento o test.')
-        continue
+        return None
     
-    try:
-        test_data['predicted_positionOrder'] = train_and_predict(train_data, test_data, 'positionOrder')
-        test_data['predicted_resultPoints'] = test_data['predicted_positionOrder'].apply(calculate_points)
-        
-        constructor_points = test_data.groupby('constructorId')['predicted_resultPoints'].sum().reset_index()
-        constructor_points.columns = ['constructorId', 'predicted_constructorPoints']
-        test_data = test_data.merge(constructor_points, on='constructorId', how='left')
-        
-        test_data['year'] = year
+    # Le strategie economiche partono dai migliori parametri della stagione precedente (dall'ultimo report)
+    warm_start = load_warm_start(year - 1) if SEARCH_STRATEGY != 'exhaustive' else None
+    
+    test_data = test_data.copy()
+    y_pred, y_std, search_info = train_and_predict(train_data, test_data, 'positionOrder', warm_start=warm_start, season=year)
+    # Il modello della stagione resta in cache e viene registrato per il server di predizione
+    register_season(year, search_info['cache_key'])
+    test_data['predicted_positionOrder'] = y_pred
+    # Ordine d'arrivo predetto di ogni gara, calcolato una sola volta per tutti gli script successivi,
+    # e punti di quell'ordine
+    with stage('scoring', season=year, rows=len(test_data)):
+        test_data['predicted_rank'] = rank_within_races(test_data['raceId'].to_numpy(), y_pred)
+        test_data['predicted_resultPoints'] = points_for_positions(test_data['predicted_rank'])
+    
+    if TRAIN_RANKER:
+        X_train, y_train = create_features_and_labels(train_data, 'positionOrder')
+        X_test, y_test = create_features_and_labels(test_data, 'positionOrder')
+        test_data['predicted_rank_ltr'], ranker_results = compare_rankers(
+            X_train, y_train, train_data['raceId'], X_test, y_test, test_data['raceId'], y_pred)
+        ranker = ranker_results['ranker']
+        regressor = ranker_results['regressor']
+        print(f"Anno {year}: regressore esatte {regressor['exact']:.1%}, entro una {regressor['within_one']:.1%}, "
+              f"errore medio {regressor['mae']:.2f} | ranker esatte {ranker['exact']:.1%}, entro una {ranker['within_one']:.1%}, "
+              f"errore medio {ranker['mae']:.2f}, fit {ranker['fit_seconds']:.2f}s, predizione {ranker['predict_seconds'] * 1000:.1f}ms")
+    
+    constructor_points = test_data.groupby('constructorId')['predicted_resultPoints'].sum().reset_index()
+    constructor_points.columns = ['constructorId', 'predicted_constructorPoints']
+    test_data = test_data.merge(constructor_points, on='constructorId', how='left')
+    
+    test_data['year'] = year
+    if y_std is not None:
+        test_data['predicted_positionStd'] = y_std
+    return test_data, search_info
+
+if __name__ == '__main__':
+    if PROFILE_STAGES:
+        enable_profiling()
+    
+    # Aggiorna le caratteristiche aggiuntive con gli eventuali nuovi risultati
+    update_feature_store()
+    
+    # Prepara le partizioni per stagione prima di avviare i processi, che le leggono soltanto
+    with stage('materialize'):
+        materialize_partitions()
+    
+    # Predizione per ogni anno dal 2018 al 2023, una stagione per processo:
+    # ogni processo carica solo le stagioni della propria finestra
+    years = range(2018, 2024)
+    all_predictions, search_infos = run_backtest(None, years, predict_season, n_workers=N_WORKERS)
+    
+    # Parametri scelti e tempo di ricerca per ogni stagione
+    if search_infos:
+        search_report = save_report(search_infos)
+        print(search_report.to_string(index=False))
+    
+    if all_predictions is not None:
+        print("DataFrame combinato:")
+        print(all_predictions.head())
+        print(all_predictions.columns)
         
-        predictions.append(test_data)
-    except Exception as e:
-        print(f"Errore durante la predizione per l'anno {year}: {e}")
-
-if predictions:
-    all_predictions = pd.concat(predictions)
-    print("DataFrame combinato:")
-    print(all_predictions.head())
-    print(all_predictions.columns)
-    
-    try:
-        all_predictions.to_csv('predicted_results6.csv', index=False)
-        print("Le predizioni sono state salvate in 'predicted_results_2018_2023.csv'.")
-    except Exception as e:
-        print(f"Errore durante il salvataggio del file: {e}")
-else:
-    print('Nessuna predizione disponibile.')
+        try:
+            save_predictions(all_predictions, 'predicted_results6.csv')
+            print("Le predizioni sono state salvate in 'predicted_results6.csv'.")
+        except Exception as e:
+            print(f"Errore durante il salvataggio del file: {e}")
+    else:
+        print('Nessuna predizione disponibile.')
+    
+    # Tempo, CPU e memoria di ogni fase e di ogni stagione (log completo in run_log.jsonl)
+    print(summarize_run().to_string(index=False))
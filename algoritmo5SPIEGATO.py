@@ -6,9 +6,13 @@ from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 import numpy as np
 import os
+from data_layer import load_dataset
+from scoring import predicted_points
 
-# Carica i dati
-data = pd.read_csv('final_data_sorted.csv')
+# Carica i dati dal file colonnare, solo con le colonne usate dal modello e quelle lette
+# dagli script che analizzano le predizioni (report, tabelle, accuratezza, simulazione)
+data = load_dataset(columns=['raceId', 'raceName', 'year', 'resultId', 'driverId', 'driverForename', 'driverSurname',
+                             'constructorId', 'constructorName', 'grid', 'positionOrder', 'raceStatus'])
 
 # Verifica delle colonne
 # Assicuriamoci che il DataFrame contenga tutte le colonne necessarie
@@ -90,31 +94,6 @@ def train_and_predict(train_data, test_data, target_col):
     
     return y_pred
 
-# Calcolo dei punti in base alla posizione predetta
-def calculate_points(position):
-    if position == 1:
-        return 25
-    elif position == 2:
-        return 18
-    elif position == 3:
-        return 15
-    elif position == 4:
-        return 12
-    elif position == 5:
-        return 10
-    elif position == 6:
-        return 8
-    elif position == 7:
-        return 6
-    elif position == 8:
-        return 4
-    elif position == 9:
-        return 2
-    elif position == 10:
-        return 1
-    else:
-        return 0
-
 # Predizione per ogni anno dal 2018 al 2023
 predictions = []
 years = range(2018, 2024)
@@ -130,8 +109,8 @@ for year in years:
     try:
         # Prevedi le posizioni finali dei piloti
         test_data['predicted_positionOrder'] = train_and_predict(train_data, test_data, 'positionOrder')
-        # Calcola i punti in base alle posizioni predette
-        test_data['predicted_resultPoints'] = test_data['predicted_positionOrder'].apply(calculate_points)
+        # Calcola i punti ordinando le posizioni predette all'interno di ogni gara
+        test_data['predicted_resultPoints'] = predicted_points(test_data)
         
         # Calcola i punti per i costruttori
         constructor_points = test_data.groupby('constructorId')['predicted_resultPoints'].sum().reset_index()
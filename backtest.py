@@ -0,0 +1,57 @@
+import pandas as pd
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Numero di processi predefinito per il backtest
+N_WORKERS = os.cpu_count() or 1
+
+
+# Funzione per estrarre solo le righe che servono a una stagione (5 anni di training + anno di test),
+# così ogni processo riceve una porzione ridotta del dataset. Con data None ogni processo
+# carica da sé la propria finestra
+def season_window(data, year, train_years=5):
+    if data is None:
+        return None
+    return data[(data['year'] >= year - train_years) & (data['year'] <= year)]
+
+
+# Funzione per eseguire una stagione catturando gli errori, come nel ciclo originale
+def _run_season(predict_season, data, year):
+    start_time = time.time()
+    try:
+        result = predict_season(data, year)
+    except Exception as e:
+        print(f"Errore durante la predizione per l'anno {year}: {e}")
+        result = None
+    return year, result, time.time() - start_time
+
+
+# Funzione per eseguire il backtest walk-forward: ogni stagione è indipendente e viene inviata
+# a un pool di processi. predict_season(data, year) deve essere una funzione a livello di modulo
+# e restituire la coppia (DataFrame delle predizioni, informazioni sulla stagione) oppure None.
+# Restituisce le predizioni concatenate e la lista [(anno, informazioni)], entrambe ordinate per anno
+def run_backtest(data, years, predict_season, n_workers=N_WORKERS):
+    years = list(years)
+    n_workers = max(1, min(n_workers, len(years)))
+    results = {}
+
+    if n_workers == 1:
+        for year in years:
+            year, result, seconds = _run_season(predict_season, season_window(data, year), year)
+            results[year] = result
+            print(f"Anno {year}: completato in {seconds:.2f} secondi")
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(_run_season, predict_season, season_window(data, year), year) for year in years]
+            for future in futures:
+                year, result, seconds = future.result()
+                results[year] = result
+                print(f"Anno {year}: completato in {seconds:.2f} secondi")
+
+    completed = [year for year in years if results[year] is not None]
+    predictions = [results[year][0] for year in completed]
+    infos = [(year, results[year][1]) for year in completed]
+    if not predictions:
+        return None, infos
+    return pd.concat(predictions), infos
@@ -0,0 +1,70 @@
+import pandas as pd
+import numpy as np
+import pickle
+import time
+from sklearn.base import clone
+from algoritmo5BEST import create_features_and_labels, fit_model, load_season_data, prepare_data_for_year, \
+    update_feature_store
+from data_layer import materialize_partitions
+from model_backends import BACKENDS
+
+# File con i risultati del confronto tra i backend
+BENCHMARK_PATH = 'backend_benchmark.csv'
+
+# Numero di ripetizioni della predizione di una singola gara per misurarne la latenza
+LATENCY_REPEATS = 20
+
+
+# Funzione per misurare un backend su una stagione con il modello scelto dalla ricerca, come in algoritmo5BEST
+# (dalla cache se la ricerca è già stata eseguita): durata della ricerca, tempo dell'addestramento finale con
+# i parametri scelti, tempo di predizione della stagione, latenza della predizione di una singola gara,
+# dimensione del modello serializzato ed errore medio
+def benchmark_season(name, train_data, test_data, year):
+    X_train, y_train = create_features_and_labels(train_data, 'positionOrder')
+    X_test, y_test = create_features_and_labels(test_data, 'positionOrder')
+    pipeline, search_info = fit_model(train_data, 'positionOrder', season=year, backend=name)
+
+    start_time = time.perf_counter()
+    clone(pipeline).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    y_pred = pipeline.predict(X_test)
+    predict_seconds = time.perf_counter() - start_time
+
+    race = X_test[test_data['raceId'].to_numpy() == test_data['raceId'].iloc[0]]
+    start_time = time.perf_counter()
+    for _ in range(LATENCY_REPEATS):
+        pipeline.predict(race)
+    race_latency_ms = (time.perf_counter() - start_time) / LATENCY_REPEATS * 1000
+
+    return {
+        'backend': name,
+        'search_seconds': search_info['seconds'],
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds,
+        'race_latency_ms': race_latency_ms,
+        'model_mb': len(pickle.dumps(pipeline)) / 1024 ** 2,
+        'mae': np.mean(np.abs(y_pred - y_test.to_numpy())),
+    }
+
+
+if __name__ == '__main__':
+    update_feature_store()
+    materialize_partitions()
+
+    rows = []
+    for year in range(2018, 2024):
+        for name in BACKENDS:
+            # Ogni backend riceve i dati come nel training: con i NaN se li gestisce da solo
+            train_data, test_data = prepare_data_for_year(load_season_data(year, backend=name), year)
+            row = benchmark_season(name, train_data, test_data, year)
+            rows.append(dict(row, year=year))
+            print(f"Anno {year} {name}: ricerca {row['search_seconds']:.1f}s, fit {row['fit_seconds']:.2f}s, predizione {row['predict_seconds'] * 1000:.1f}ms, "
+                  f"gara {row['race_latency_ms']:.1f}ms, modello {row['model_mb']:.1f}MB, MAE {row['mae']:.3f}")
+
+    benchmark = pd.DataFrame(rows)
+    benchmark = benchmark[['year'] + [col for col in benchmark.columns if col != 'year']]
+    benchmark.to_csv(BENCHMARK_PATH, index=False)
+    print(benchmark.groupby('backend').mean(numeric_only=True).drop(columns='year').to_string())
+    print(f"Il confronto tra i backend è stato salvato in '{BENCHMARK_PATH}'.")
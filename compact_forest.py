@@ -0,0 +1,277 @@
+import numpy as np
+import json
+import os
+import shutil
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler
+from model_cache import MODEL_CACHE_DIR, load_model, season_keys
+
+# Cartella con i modelli esportati in forma compatta (una sottocartella per stagione)
+COMPACT_MODEL_DIR = 'compact_models'
+
+# Array dei nodi di tutti gli alberi, concatenati uno dopo l'altro
+NODE_ARRAYS = ['feature', 'threshold', 'children_left', 'children_right', 'value']
+
+# Funzione per separare i passi di una pipeline foresta: statistiche dell'imputer, media e scala dello scaler
+# e foresta. Solleva ValueError per modelli che non si possono esportare
+def forest_steps(model):
+    steps = [step for _, step in model.steps] if hasattr(model, 'steps') else [model]
+    imputer_statistics = scaler = None
+    for step in steps[:-1]:
+        if isinstance(step, SimpleImputer) and step.strategy in ('mean', 'median', 'most_frequent', 'constant'):
+            imputer_statistics = np.asarray(step.statistics_, dtype=float)
+        elif isinstance(step, StandardScaler):
+            mean = step.mean_ if step.with_mean else np.zeros(step.n_features_in_)
+            scale = step.scale_ if step.with_std else np.ones(step.n_features_in_)
+            scaler = (np.asarray(mean, dtype=float), np.asarray(scale, dtype=float))
+        else:
+            raise ValueError(f"Passo della pipeline non esportabile: {type(step).__name__}")
+    forest = steps[-1]
+    if not isinstance(forest, (RandomForestRegressor, ExtraTreesRegressor)) or forest.n_outputs_ != 1:
+        raise ValueError(f"Modello non esportabile: {type(forest).__name__}")
+    return imputer_statistics, scaler, forest
+
+
+# Funzione per concatenare i nodi di tutti gli alberi in array piatti, con i figli come indici globali
+def flatten_forest(forest):
+    arrays = {name: [] for name in NODE_ARRAYS}
+    roots = []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        leaf = tree.children_left < 0
+        roots.append(offset)
+        arrays['feature'].append(np.where(leaf, -1, tree.feature).astype(np.int32))
+        arrays['threshold'].append(tree.threshold.astype(np.float64))
+        arrays['children_left'].append(np.where(leaf, -1, tree.children_left + offset).astype(np.int32))
+        arrays['children_right'].append(np.where(leaf, -1, tree.children_right + offset).astype(np.int32))
+        arrays['value'].append(tree.value.reshape(-1).astype(np.float64))
+        offset += tree.node_count
+    flat = {name: np.concatenate(values) for name, values in arrays.items()}
+    flat['roots'] = np.array(roots, dtype=np.int32)
+    return flat
+
+
+# Decisione originale di un nodo: la foresta confronta in float32 il valore standardizzato con la soglia
+def _scaled_goes_left(values, mean, scale, threshold):
+    return np.float32((values - mean) / scale) <= threshold
+
+
+# Funzioni per convertire i float64 in interi con lo stesso ordinamento, e viceversa
+def _float_to_key(values):
+    bits = np.asarray(values, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & np.int64(0x7FFFFFFFFFFFFFFF)), bits)
+
+
+def _key_to_float(keys):
+    bits = np.where(keys < 0, (-keys) | np.int64(-0x8000000000000000), keys)
+    return bits.view(np.float64)
+
+
+# Funzione per piegare lo scaler (e il confronto in float32) nelle soglie: per ogni nodo cerca il float64 x
+# più grande che la pipeline originale manda a sinistra, così x <= soglia_piegata dà per ogni valore
+# la stessa decisione di scaler + confronto in float32. La decisione è monotona in x: la ricerca è una
+# bisezione sui float64 tra i valori che corrispondono al float32 più grande non oltre la soglia e al successivo.
+# Restituisce None se per qualche nodo non si trova l'intervallo (es. scala non positiva)
+def fold_thresholds(feature, threshold, mean, scale):
+    folded = threshold.copy()
+    split = feature >= 0
+    f = feature[split]
+    t = threshold[split]
+    m = mean[f]
+    s = scale[f]
+
+    def goes_left(keys):
+        return _scaled_goes_left(_key_to_float(keys), m, s, t)
+
+    below = np.float32(t)
+    below = np.where(below.astype(np.float64) <= t, below, np.nextafter(below, np.float32(-np.inf)))
+    above = np.nextafter(below, np.float32(np.inf))
+    low = _float_to_key(below.astype(np.float64) * s + m)
+    high = _float_to_key(above.astype(np.float64) * s + m)
+    if np.any(s <= 0) or not (goes_left(low).all() and not goes_left(high).any()):
+        return None
+
+    while np.any(high - low > 1):
+        middle = low + (high - low) // 2
+        left = goes_left(middle)
+        low = np.where(left, middle, low)
+        high = np.where(left, high, middle)
+
+    folded[split] = _key_to_float(low)
+    return folded
+
+
+# Funzione per esportare una pipeline foresta in una cartella di file .npy mappabili in memoria.
+# Lo scaler viene piegato nelle soglie quando la verifica nodo per nodo lo consente, altrimenti
+# viene salvato e applicato in predizione. Restituisce i metadati salvati
+def export_model(model, path):
+    imputer_statistics, scaler, forest = forest_steps(model)
+    flat = flatten_forest(forest)
+
+    folded = False
+    if scaler is not None:
+        folded_threshold = fold_thresholds(flat['feature'], flat['threshold'], *scaler)
+        if folded_threshold is not None:
+            flat['threshold'] = folded_threshold
+            folded = True
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, values in flat.items():
+        np.save(os.path.join(tmp_path, f'{name}.npy'), values)
+    if imputer_statistics is not None:
+        np.save(os.path.join(tmp_path, 'imputer_statistics.npy'), imputer_statistics)
+    if scaler is not None and not folded:
+        np.save(os.path.join(tmp_path, 'scaler_mean.npy'), scaler[0])
+        np.save(os.path.join(tmp_path, 'scaler_scale.npy'), scaler[1])
+
+    depths = [estimator.tree_.max_depth for estimator in forest.estimators_]
+    meta = {'n_trees': len(forest.estimators_), 'max_depth': int(max(depths)), 'n_features': int(forest.n_features_in_),
+            'folded': folded, 'scaled': scaler is not None and not folded, 'imputed': imputer_statistics is not None,
+            'n_nodes': int(len(flat['feature']))}
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return meta
+
+
+# Foresta compatta: solo array NumPy (mappati in memoria) e una predizione a batch su tutti gli alberi
+class CompactForest:
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        for name, values in arrays.items():
+            setattr(self, name, values)
+
+    # Funzione per caricare una foresta esportata senza leggere gli array in memoria
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        names = NODE_ARRAYS + ['roots']
+        if meta['imputed']:
+            names.append('imputer_statistics')
+        if meta['scaled']:
+            names += ['scaler_mean', 'scaler_scale']
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in names}
+        return cls(meta, arrays)
+
+    # Funzione per portare le righe nello spazio delle soglie salvate, come farebbe la pipeline originale
+    def _transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        if self.meta['imputed']:
+            X = np.where(np.isnan(X), self.imputer_statistics, X)
+        if self.meta['scaled']:
+            X = (X - self.scaler_mean) / self.scaler_scale
+        if not self.meta['folded']:
+            # La foresta confronta le feature in float32
+            X = X.astype(np.float32).astype(np.float64)
+        return X
+
+    # Funzione per predire un batch di righe: tutte le coppie (riga, albero) avanzano insieme di un livello
+    # per passo, e ad ogni passo restano solo quelle non ancora arrivate in una foglia. Le predizioni degli
+    # alberi vengono poi sommate in ordine come nella foresta originale, così il risultato è identico
+    def predict(self, X):
+        X = self._transform(X)
+        n_rows, n_features = X.shape
+        n_trees = self.meta['n_trees']
+        X = X.ravel()
+
+        # Coppie in ordine riga per riga: la coppia i è la riga i // n_trees sull'albero i % n_trees
+        nodes = np.tile(np.asarray(self.roots, dtype=np.int64), n_rows)
+        offsets = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        active = np.flatnonzero(self.feature[nodes] >= 0)
+        while active.size:
+            current = nodes[active]
+            goes_left = X[offsets[active] + self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(goes_left, self.children_left[current], self.children_right[current])
+            active = active[self.feature[nodes[active]] >= 0]
+
+        leaf_values = self.value[nodes].reshape(n_rows, n_trees)
+        prediction = np.zeros(n_rows)
+        for tree in range(n_trees):
+            prediction += leaf_values[:, tree]
+        return prediction / n_trees
+
+
+# Funzione per esportare i modelli di tutte le stagioni registrate nella cache. Restituisce {anno: metadati}
+def export_season_models(cache_dir=MODEL_CACHE_DIR, export_dir=COMPACT_MODEL_DIR):
+    os.makedirs(export_dir, exist_ok=True)
+    exported = {}
+    for year, key in season_keys(cache_dir).items():
+        entry = load_model(key, cache_dir)
+        if entry is None:
+            continue
+        try:
+            exported[year] = dict(export_model(entry['model'], os.path.join(export_dir, str(year))), key=key)
+        except ValueError as e:
+            print(f"Anno {year}: modello non esportato ({e})")
+            continue
+        with open(os.path.join(export_dir, str(year), 'source.json'), 'w') as f:
+            json.dump({'key': key}, f)
+    return exported
+
+
+# Funzione per caricare i modelli compatti ancora allineati alla cache (stessa chiave). Restituisce {anno: foresta}
+def load_season_models(export_dir=COMPACT_MODEL_DIR, cache_dir=MODEL_CACHE_DIR):
+    models = {}
+    for year, key in season_keys(cache_dir).items():
+        path = os.path.join(export_dir, str(year))
+        source_path = os.path.join(path, 'source.json')
+        if not os.path.exists(source_path):
+            continue
+        with open(source_path) as f:
+            if json.load(f)['key'] != key:
+                continue
+        models[year] = CompactForest.load(path)
+    return models
+
+
+if __name__ == '__main__':
+    import time
+    import tracemalloc
+    from algoritmo5BEST import MODEL_FEATURES
+    from data_layer import load_dataset
+    from feature_store import stored_features
+
+    exported = export_season_models()
+    for year, meta in exported.items():
+        print(f"Anno {year}: {meta['n_trees']} alberi, {meta['n_nodes']} nodi, scaler piegato nelle soglie: {meta['folded']}")
+
+    # Confronto tra il caricamento completo dei modelli e quello compatto
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    full_models = {year: load_model(key)['model'] for year, key in season_keys().items()}
+    full_seconds = time.perf_counter() - start_time
+    full_mb = tracemalloc.get_traced_memory()[0] / 1024 ** 2
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    start_time = time.perf_counter()
+    compact_models = load_season_models()
+    compact_seconds = time.perf_counter() - start_time
+    compact_mb = (tracemalloc.get_traced_memory()[0] - before) / 1024 ** 2
+    tracemalloc.stop()
+    full_disk_mb = sum(os.path.getsize(os.path.join(MODEL_CACHE_DIR, f'{key}.joblib')) for key in season_keys().values()) / 1024 ** 2
+    compact_disk_mb = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(COMPACT_MODEL_DIR)
+                          for name in names) / 1024 ** 2
+    print(f"Caricamento completo: {full_seconds:.3f}s, {full_mb:.1f}MB in memoria, {full_disk_mb:.1f}MB su disco | "
+          f"compatto: {compact_seconds:.3f}s, {compact_mb:.2f}MB in memoria, {compact_disk_mb:.1f}MB su disco")
+
+    # Verifica che le predizioni siano identiche sulle righe del dataset
+    data = load_dataset(columns=['resultId', 'grid'])
+    features = stored_features(data['resultId'])
+    data[features.columns] = features.to_numpy()
+    X = data.fillna(0)[MODEL_FEATURES]
+    for year, model in compact_models.items():
+        start_time = time.perf_counter()
+        compact = model.predict(X)
+        compact_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        full = full_models[year].predict(X)
+        full_seconds = time.perf_counter() - start_time
+        print(f"Anno {year}: predizioni identiche {np.array_equal(compact, full)}, "
+              f"{len(X)} righe in {compact_seconds * 1000:.1f}ms (originale {full_seconds * 1000:.1f}ms)")
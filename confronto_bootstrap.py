@@ -0,0 +1,28 @@
+from evaluation import bootstrap_comparison, evaluate_files
+
+# Carica i dati delle predizioni
+files = [
+    'predicted_results3.csv',
+    'predicted_results4.csv',
+    'predicted_results5.csv',
+    'predicted_results6.csv'
+]
+
+# Metrica usata per il confronto tra i modelli
+metric = 'mean_position_diff'
+
+# Calcola le metriche per gara di tutti i modelli e confrontali con un bootstrap sulle gare
+metrics_per_race, metrics_summary = evaluate_files(files, fraction=1)
+comparison, win_rates = bootstrap_comparison(metrics_per_race, metric)
+
+print(comparison.to_string(index=False))
+print(win_rates.round(3).to_string())
+
+# Salva gli intervalli di confidenza e le vittorie appaiate in file CSV
+output_csv_comparison = 'bootstrap_comparison.csv'
+comparison.to_csv(output_csv_comparison, index=False)
+print(f"Il confronto bootstrap tra i modelli è stato salvato in '{output_csv_comparison}'.")
+
+output_csv_win_rates = 'paired_win_rates.csv'
+win_rates.to_csv(output_csv_win_rates)
+print(f"Le vittorie appaiate tra i modelli sono state salvate in '{output_csv_win_rates}'.")
@@ -0,0 +1,212 @@
+import pandas as pd
+import numpy as np
+import os
+
+# Parquet richiede pyarrow; senza di esso i dati tipizzati vengono salvati in formato pickle
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Cartella (accanto al CSV di origine) in cui vengono materializzati i file colonnari
+DATA_STORE_DIR = 'data_store'
+
+# Dataset unito e file delle predizioni usati dagli script
+DATASET_PATH = 'final_data_sorted.csv'
+
+# Colonne testuali con pochi valori distinti, salvate come categorie
+CATEGORICAL_COLUMNS = [
+    'circuitName', 'circuitLocation', 'circuitCountry',
+    'constructorName', 'constructorNationality',
+    'driverForename', 'driverSurname', 'driverNationality',
+    'raceName', 'raceStatus'
+]
+
+# Colonne con date da convertire una sola volta
+DATE_COLUMNS = ['date']
+
+
+# Funzione per ottenere il percorso del file colonnare corrispondente a un CSV
+def store_path(csv_path):
+    directory, name = os.path.split(csv_path)
+    extension = '.parquet' if HAS_PYARROW else '.pkl'
+    return os.path.join(directory, DATA_STORE_DIR, os.path.splitext(name)[0] + extension)
+
+
+# Funzione per assegnare i tipi compatti alle colonne (categorie per i nomi, date convertite)
+def apply_types(data):
+    for col in CATEGORICAL_COLUMNS:
+        if col in data.columns:
+            data[col] = data[col].astype('category')
+    for col in DATE_COLUMNS:
+        if col in data.columns:
+            data[col] = pd.to_datetime(data[col])
+    return data
+
+
+# Funzione per scrivere un DataFrame nel formato colonnare.
+# Con Parquet i gruppi di righe seguono l'ordine delle gare, così le statistiche min/max su raceId
+# fanno da indice e la lettura di poche gare salta i gruppi non necessari
+def write_store(data, path, row_group_size=500):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if HAS_PYARROW:
+        data.to_parquet(tmp_path, index=False, row_group_size=row_group_size)
+    else:
+        data.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Funzione per elencare le colonne presenti in un file colonnare
+def store_columns(path):
+    if HAS_PYARROW:
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return list(pd.read_pickle(path).columns)
+
+
+# Funzione per leggere un file colonnare, solo con le colonne (e le gare) richieste.
+# Le colonne in optional vengono lette solo se presenti nel file
+def read_store(path, columns=None, race_ids=None, optional=None):
+    if columns is not None and optional:
+        available = set(store_columns(path))
+        columns = list(columns) + [col for col in optional if col in available]
+    if HAS_PYARROW:
+        filters = [('raceId', 'in', list(race_ids))] if race_ids is not None else None
+        data = pd.read_parquet(path, columns=columns, filters=filters)
+    else:
+        data = pd.read_pickle(path)
+        if race_ids is not None:
+            data = data[data['raceId'].isin(race_ids)].reset_index(drop=True)
+        if columns is not None:
+            data = data[columns]
+    return data
+
+
+# Funzione per convertire un CSV nel formato colonnare se il file tipizzato manca o è più vecchio del CSV
+def materialize(csv_path):
+    path = store_path(csv_path)
+    if os.path.exists(path) and (not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)):
+        return path
+    data = apply_types(pd.read_csv(csv_path))
+    write_store(data, path)
+    return path
+
+
+# Funzione per caricare il dataset unito leggendo solo le colonne necessarie
+def load_dataset(columns=None, race_ids=None, csv_path=DATASET_PATH):
+    return read_store(materialize(csv_path), columns, race_ids)
+
+
+# Funzione per caricare un file di predizioni leggendo solo le colonne necessarie
+def load_predictions(csv_path, columns=None, race_ids=None, optional=None):
+    return read_store(materialize(csv_path), columns, race_ids, optional)
+
+
+# Funzione per salvare le predizioni: il CSV resta il risultato di riferimento,
+# il file colonnare viene aggiornato subito così gli script successivi non devono rileggere il CSV
+def save_predictions(data, csv_path):
+    data.to_csv(csv_path, index=False)
+    write_store(apply_types(data.copy()), store_path(csv_path))
+
+
+# Funzione per ottenere la cartella del dataset partizionato per stagione
+def partition_dir(csv_path=DATASET_PATH):
+    directory, name = os.path.split(csv_path)
+    return os.path.join(directory, DATA_STORE_DIR, os.path.splitext(name)[0] + '_by_year')
+
+
+# Funzione per ottenere il file di una singola stagione
+def partition_path(path, year):
+    extension = '.parquet' if HAS_PYARROW else '.pkl'
+    return os.path.join(path, f'year={year}{extension}')
+
+
+# Funzione per elencare le stagioni presenti nella cartella partizionata
+def available_years(path):
+    years = []
+    for name in os.listdir(path):
+        if name.startswith('year='):
+            years.append(int(os.path.splitext(name)[0][len('year='):]))
+    return sorted(years)
+
+
+# Funzione per salvare il dataset in un file per stagione se la partizione manca o è più vecchia del CSV.
+# Tutte le partizioni derivano dallo stesso DataFrame tipizzato, quindi condividono le stesse categorie
+def materialize_partitions(csv_path=DATASET_PATH):
+    path = partition_dir(csv_path)
+    marker = os.path.join(path, '_complete')
+    if os.path.exists(marker) and (not os.path.exists(csv_path) or os.path.getmtime(marker) >= os.path.getmtime(csv_path)):
+        return path
+
+    data = read_store(materialize(csv_path))
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        os.remove(os.path.join(path, name))
+    for year, season in data.groupby('year', sort=True):
+        write_store(season.reset_index(drop=True), partition_path(path, year))
+    open(marker, 'w').close()
+    return path
+
+
+# Funzione per caricare solo le stagioni da start_year a end_year (inclusi) e solo le colonne richieste.
+# Memoria e tempo di caricamento dipendono dall'ampiezza della finestra e non da tutta la storia
+def load_window(start_year, end_year, columns=None, csv_path=DATASET_PATH):
+    path = materialize_partitions(csv_path)
+    years = [year for year in available_years(path) if start_year <= year <= end_year]
+    frames = [read_store(partition_path(path, year), columns) for year in years]
+    if not frames:
+        return read_store(partition_path(path, available_years(path)[0]), columns).iloc[0:0]
+    # Le partizioni aggiunte in seguito possono avere categorie diverse: si riallineano dopo l'unione
+    return apply_types(pd.concat(frames, ignore_index=True))
+
+
+# Funzione per verificare se le partizioni sono aggiornate rispetto al CSV
+def partitions_fresh(csv_path=DATASET_PATH):
+    marker = os.path.join(partition_dir(csv_path), '_complete')
+    return os.path.exists(marker) and os.path.getmtime(marker) >= os.path.getmtime(csv_path)
+
+
+# Funzione per verificare se il file colonnare completo è aggiornato rispetto al CSV
+def store_fresh(csv_path=DATASET_PATH):
+    path = store_path(csv_path)
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+# Funzione per ottenere le gare già presenti nel dataset leggendo solo la colonna raceId
+# delle partizioni per stagione, senza rileggere il CSV
+def known_race_ids(csv_path=DATASET_PATH):
+    path = materialize_partitions(csv_path)
+    frames = [read_store(partition_path(path, year), ['raceId']) for year in available_years(path)]
+    if not frames:
+        return np.array([], dtype=np.int64)
+    return pd.concat(frames, ignore_index=True)['raceId'].unique()
+
+
+# Funzione per accodare nuove righe al dataset: il CSV viene esteso in modalità append, vengono
+# riscritte solo le partizioni delle stagioni toccate e il file colonnare completo viene esteso
+# con le nuove righe (senza rileggere il CSV). I file che erano già vecchi restano da rigenerare
+def append_rows(rows, csv_path=DATASET_PATH):
+    fresh = partitions_fresh(csv_path)
+    full_fresh = store_fresh(csv_path)
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    rows = rows[header]
+    rows.to_csv(csv_path, mode='a', header=False, index=False)
+    typed_rows = apply_types(rows.copy())
+
+    if fresh:
+        path = partition_dir(csv_path)
+        for year, season in typed_rows.groupby('year', sort=True):
+            file = partition_path(path, year)
+            if os.path.exists(file):
+                season = apply_types(pd.concat([read_store(file), season], ignore_index=True))
+            write_store(season.reset_index(drop=True), file)
+        open(os.path.join(path, '_complete'), 'w').close()
+
+    full_path = store_path(csv_path)
+    if full_fresh:
+        # Le categorie delle nuove righe possono essere diverse: si riallineano dopo l'unione
+        write_store(apply_types(pd.concat([read_store(full_path), typed_rows], ignore_index=True)), full_path)
+    elif os.path.exists(full_path):
+        os.remove(full_path)
@@ -1,10 +1,12 @@
-import pandas as pd
+from data_layer import load_predictions
 
 # Carica i dati delle predizioni
 file = 'predicted_results6.csv'
 
-# Leggi il file
-data = pd.read_csv(file)
+# Leggi il file (solo le colonne usate per la tabella)
+data = load_predictions(file, columns=[
+    'raceId', 'raceName', 'year', 'driverForename', 'driverSurname', 'positionOrder', 'predicted_positionOrder', 'raceStatus'
+])
 
 # Ordina i dati per gara e posizione predetta
 data = data.sort_values(by=['raceId', 'predicted_positionOrder'])
@@ -12,7 +14,7 @@ data = data.sort_values(by=['raceId', 'predicted_positionOrder'])
 # Funzione per generare l'HTML con le prime 10 posizioni per ogni gara
 def generate_html(data):
     html = ""
-    grouped = data.groupby(['raceId', 'raceName', 'year'])
+    grouped = data.groupby(['raceId', 'raceName', 'year'], observed=True)
     for name, group in grouped:
         html += f"<h2>{name[1]} ({name[2]})</h2>"
         html += "<table border='1'><tr><th>Pilota</th><th>Posizione predetta</th><th>Posizione reale</th><th>Race Status</th></tr>"
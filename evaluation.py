@@ -0,0 +1,184 @@
+import pandas as pd
+import numpy as np
+from data_layer import load_predictions
+from ranking import rank_within_races
+from scoring import points_for_positions
+
+# Colonne lette da ogni file di predizioni
+PREDICTION_COLUMNS = ['raceId', 'raceName', 'year', 'driverId', 'positionOrder', 'predicted_positionOrder']
+
+# Chiave di allineamento delle righe tra i modelli e colonne che identificano una gara
+ROW_KEYS = ['raceId', 'driverId']
+RACE_KEYS = ['raceId', 'raceName', 'year']
+
+# Soglia oltre la quale un errore di posizione è considerato un outlier
+OUTLIER_THRESHOLD = 10
+
+# Metriche calcolate per ogni gara e ogni modello
+METRICS = ['mean_position_diff', 'mean_position_diff_all', 'exact', 'within_one', 'points_error', 'spearman']
+
+
+# Funzione per dare un nome ai modelli come negli script di accuratezza ('Prediction 3', 'Prediction 4', ...)
+def prediction_labels(files, first=3):
+    return [f'Prediction {i + first}' for i in range(len(files))]
+
+
+# Funzione per leggere i file di predizioni uno alla volta, solo con le colonne necessarie
+def iter_predictions(files, labels=None):
+    labels = labels or prediction_labels(files)
+    for label, file in zip(labels, files):
+        yield label, load_predictions(file, columns=PREDICTION_COLUMNS)
+
+
+# Funzione per allineare N file di predizioni su (raceId, driverId): una riga per pilota e gara,
+# con le informazioni della gara e una colonna di predizioni per modello (NaN se il modello non ha la riga).
+# Restituisce anche le gare nell'ordine di prima apparizione nei file, usato per il campionamento
+def align_predictions(files, labels=None):
+    info = []
+    predictions = {}
+    for label, df in iter_predictions(files, labels):
+        df = df.set_index(ROW_KEYS)
+        info.append(df[['raceName', 'year', 'positionOrder']])
+        predictions[label] = df['predicted_positionOrder']
+
+    info = pd.concat(info)
+    races = info.reset_index()[RACE_KEYS].astype({'raceName': str}).drop_duplicates()
+    aligned = info[~info.index.duplicated()].astype({'raceName': str})
+    for label, values in predictions.items():
+        aligned[label] = values.reindex(aligned.index).to_numpy()
+    # Le righe di ogni gara restano nell'ordine dei file, così le medie sommano i valori nello stesso ordine
+    aligned = aligned.reset_index()
+    return aligned.sort_values(by='raceId', kind='stable').reset_index(drop=True), races.reset_index(drop=True)
+
+
+# Funzione per selezionare una frazione delle gare a caso, come negli script originali
+def sample_races(races, fraction=1.0, random_state=42):
+    return races.sample(n=int(fraction * len(races)), random_state=random_state)
+
+
+# Funzione per calcolare tutte le metriche di tutti i modelli in un solo passaggio vettorizzato.
+# Gli errori "senza outlier" escludono le righe con errore >= outlier_threshold
+# (o > outlier_threshold con include_threshold=True); con outlier_threshold None non si esclude nulla.
+# Restituisce le metriche per gara (colonne a due livelli: metrica, modello) e le metriche medie per modello
+def evaluate(aligned, labels, outlier_threshold=OUTLIER_THRESHOLD, include_threshold=False):
+    race_ids = aligned['raceId'].to_numpy()
+    actual = aligned['positionOrder'].to_numpy(dtype=float)
+    predicted = aligned[labels].to_numpy(dtype=float)
+    present = ~np.isnan(predicted)
+
+    diff = np.abs(actual[:, None] - predicted)
+    if outlier_threshold is None:
+        inlier = present
+    elif include_threshold:
+        inlier = diff <= outlier_threshold
+    else:
+        inlier = diff < outlier_threshold
+
+    # Ordine d'arrivo predetto e reale di ogni modello, calcolati solo sulle righe che il modello copre
+    ranks = np.empty(predicted.shape)
+    actual_ranks = np.empty(predicted.shape)
+    for i in range(len(labels)):
+        ranks[:, i] = rank_within_races(race_ids, predicted[:, i])
+        actual_ranks[:, i] = rank_within_races(race_ids, np.where(present[:, i], actual, np.nan))
+    rank_diff = np.abs(ranks - actual[:, None])
+    points_diff = np.abs(points_for_positions(ranks) - points_for_positions(np.broadcast_to(actual[:, None], ranks.shape)))
+
+    def masked(values, mask=present):
+        return np.where(mask, values, np.nan)
+
+    row_metrics = {
+        'mean_position_diff': masked(diff, inlier),
+        'mean_position_diff_all': masked(diff),
+        'exact': masked(rank_diff == 0),
+        'within_one': masked(rank_diff <= 1),
+        'points_error': masked(points_diff),
+        'squared_rank_diff': masked((ranks - actual_ranks) ** 2),
+        'n_drivers': present.astype(float),
+    }
+    frame = pd.concat({name: pd.DataFrame(values, columns=labels) for name, values in row_metrics.items()}, axis=1)
+    frame.index = pd.MultiIndex.from_frame(aligned[RACE_KEYS])
+
+    per_race = frame.groupby(level=RACE_KEYS, sort=True).mean()
+    n = frame['n_drivers'].groupby(level=RACE_KEYS, sort=True).sum().where(lambda count: count > 1)
+    spearman = 1 - 6 * per_race['squared_rank_diff'] / (n ** 2 - 1)
+    per_race = pd.concat({**{name: per_race[name] for name in METRICS if name != 'spearman'}, 'spearman': spearman}, axis=1)
+
+    per_race.columns.names = ['metric', 'Prediction']
+
+    # Media sulle gare per modello, con la stessa groupby (e lo stesso ordine di somma) degli script originali
+    summary = per_race.stack(level='Prediction', future_stack=True).groupby(level='Prediction').mean()
+    summary = summary.loc[labels, METRICS]
+    summary.columns.name = None
+    return per_race, summary.reset_index()
+
+
+# Funzione per valutare direttamente una lista di file, eventualmente su un campione delle gare
+def evaluate_files(files, labels=None, fraction=1.0, random_state=42, **kwargs):
+    labels = labels or prediction_labels(files)
+    aligned, races = align_predictions(files, labels)
+    sample = sample_races(races, fraction, random_state)
+    aligned = aligned[aligned['raceId'].isin(sample['raceId'])]
+    return evaluate(aligned, labels, **kwargs)
+
+
+# Vista con una sola metrica per gara (una colonna per modello), come accuracy_per_race degli script originali
+def per_race_view(per_race, metric='mean_position_diff'):
+    return per_race[metric].dropna(how='all')
+
+
+# Vista con la media finale di una metrica per modello, come final_accuracy_summary degli script originali
+def summary_view(summary, metric='mean_position_diff'):
+    return summary[['Prediction', metric]]
+
+
+# Metriche per cui un valore più alto indica un modello migliore (per le altre conta il valore più basso)
+HIGHER_IS_BETTER = {'exact', 'within_one', 'spearman'}
+
+# Numero di ricampionamenti e livello di confidenza predefiniti del bootstrap
+N_BOOTSTRAP = 5000
+CONFIDENCE = 0.95
+
+
+# Funzione per generare i ricampionamenti delle gare: una matrice di indici (ricampionamenti x gare),
+# convertita con un solo bincount nella matrice di conteggi di quante volte ogni gara viene ripresa
+def bootstrap_counts(n_races, n_boot=N_BOOTSTRAP, seed=42):
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, n_races, size=(n_boot, n_races))
+    offsets = np.arange(n_boot)[:, None] * n_races
+    return np.bincount((index + offsets).ravel(), minlength=n_boot * n_races).reshape(n_boot, n_races).astype(float)
+
+
+# Funzione per confrontare i modelli con un bootstrap sulle gare, vettorizzato: le medie di tutti i ricampionamenti
+# e di tutti i modelli sono un prodotto tra la matrice dei conteggi e la matrice (gare x modelli) della metrica.
+# Tutti i modelli usano gli stessi ricampionamenti, quindi i confronti sono appaiati.
+# Restituisce media, intervallo di confidenza e probabilità di essere il migliore per ogni modello,
+# e la matrice delle vittorie appaiate (riga batte colonna)
+def bootstrap_comparison(per_race, metric='mean_position_diff', n_boot=N_BOOTSTRAP, confidence=CONFIDENCE, seed=42):
+    values = per_race[metric]
+    labels = list(values.columns)
+    matrix = values.to_numpy(dtype=float)
+    present = ~np.isnan(matrix)
+
+    counts = bootstrap_counts(len(matrix), n_boot, seed)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (counts @ np.where(present, matrix, 0)) / (counts @ present)
+
+    # Con le metriche "più alto è meglio" si confrontano i valori cambiati di segno
+    scores = -means if metric in HIGHER_IS_BETTER else means
+    alpha = (1 - confidence) / 2
+    best = np.argmin(np.where(np.isnan(scores), np.inf, scores), axis=1)
+
+    summary = pd.DataFrame({
+        'Prediction': labels,
+        metric: np.nanmean(matrix, axis=0),
+        'ci_low': np.nanquantile(means, alpha, axis=0),
+        'ci_high': np.nanquantile(means, 1 - alpha, axis=0),
+        'prob_best': np.bincount(best, minlength=len(labels)) / n_boot,
+    })
+
+    # Per ogni coppia di modelli, frazione dei ricampionamenti in cui il modello di riga è migliore di quello di colonna
+    win_rates = np.empty((len(labels), len(labels)))
+    for i in range(len(labels)):
+        win_rates[i] = np.mean(scores[:, [i]] < scores, axis=0)
+    win_rates = pd.DataFrame(win_rates, index=pd.Index(labels, name='Prediction'), columns=labels)
+    return summary, win_rates
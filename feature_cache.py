@@ -0,0 +1,187 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import inspect
+import json
+import os
+from race_features import HISTORY_BUILDERS, HISTORY_COLUMNS, HISTORY_FEATURES, build_history_features, history_frame
+
+# Cartella della cache delle matrici di feature (una sottocartella per insieme di feature)
+FEATURE_CACHE_DIR = 'feature_cache'
+
+# Versione del formato delle voci: cambiandola tutte le matrici vengono ricalcolate
+FEATURE_CACHE_VERSION = 1
+
+
+# Funzione per la posizione di partenza, usata così com'è. Tutte le funzioni di calcolo ricevono
+# anche le feature richieste, usate da quelle che ne calcolano più di una
+def grid_feature(data, features):
+    return data[['grid']]
+
+
+# Funzione per la posizione d'arrivo della gara precedente del pilota (nelle righe ricevute)
+def previous_position_feature(data, features):
+    return data.groupby('driverId')['positionOrder'].shift(1).rename('previous_position').to_frame()
+
+
+# Funzione per i punti della gara precedente del pilota (nelle righe ricevute)
+def previous_points_feature(data, features):
+    return data.groupby('driverId')['resultPoints'].shift(1).rename('previous_points').to_frame()
+
+
+# Definizione di ogni feature: colonne del dataset da cui dipende, funzione che la calcola (la stessa funzione
+# può calcolare più feature insieme, e viene chiamata una sola volta) e, in code, le funzioni il cui sorgente
+# determina i suoi valori (se manca, solo la funzione di calcolo). Modificare una di queste funzioni
+# invalida solo le feature che la elencano
+FEATURE_DEFINITIONS = {
+    'grid': {'columns': ['grid'], 'builder': grid_feature},
+    'previous_position': {'columns': ['driverId', 'positionOrder'], 'builder': previous_position_feature},
+    'previous_points': {'columns': ['driverId', 'resultPoints'], 'builder': previous_points_feature},
+}
+for feature in HISTORY_FEATURES:
+    FEATURE_DEFINITIONS[feature] = {'columns': HISTORY_COLUMNS, 'builder': build_history_features,
+                                    'code': [build_history_features, history_frame, HISTORY_BUILDERS[feature]]}
+
+# Insiemi di feature usati dagli esperimenti in try/
+FEATURE_SETS = {
+    'history': ['grid', 'previous_position'] + HISTORY_FEATURES,
+    'track': ['grid', 'previous_position', 'track_avg_position', 'track_wins', 'track_podiums'],
+    'points': ['grid', 'previous_position', 'previous_points'],
+}
+
+# Versione del codice di ogni funzione, calcolata una sola volta per processo
+_code_versions = {}
+
+
+# Funzione per ottenere la versione del codice di una funzione: hash del suo sorgente
+def code_version(function):
+    if function not in _code_versions:
+        _code_versions[function] = hashlib.sha256(inspect.getsource(function).encode()).hexdigest()
+    return _code_versions[function]
+
+
+# Funzione per calcolare la firma di ogni feature: versione del codice, colonne da cui dipende
+# e hash dei loro valori nelle righe ricevute. Una feature va ricalcolata solo se la sua firma cambia
+def feature_signatures(data, features):
+    data_hashes = {}
+    signatures = {}
+    for feature in features:
+        definition = FEATURE_DEFINITIONS[feature]
+        columns = tuple(definition['columns'])
+        if columns not in data_hashes:
+            values = pd.util.hash_pandas_object(data[list(columns)], index=False).to_numpy()
+            data_hashes[columns] = hashlib.sha256(values.tobytes()).hexdigest()
+        digest = hashlib.sha256()
+        digest.update(json.dumps([FEATURE_CACHE_VERSION, feature, list(columns)]).encode())
+        for function in definition.get('code', [definition['builder']]):
+            digest.update(code_version(function).encode())
+        digest.update(data_hashes[columns].encode())
+        signatures[feature] = digest.hexdigest()
+    return signatures
+
+
+# Funzione per ottenere i percorsi (matrice e metadati) della voce di un insieme di feature per una stagione
+def entry_paths(feature_set, season, part, cache_dir=FEATURE_CACHE_DIR):
+    base = os.path.join(cache_dir, feature_set, f'{season}-{part}')
+    return f'{base}.npy', f'{base}.json'
+
+
+# Funzione per leggere i metadati di una voce (None se manca o non è leggibile)
+def _read_meta(meta_path):
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Funzione per cercare tra le voci della stessa stagione (di qualsiasi insieme) le colonne già calcolate
+# con la stessa firma. Restituisce {feature: (percorso della matrice, indice della colonna)}
+def _reusable_columns(season, part, signatures, cache_dir):
+    found = {}
+    if not os.path.isdir(cache_dir):
+        return found
+    wanted = {signature: feature for feature, signature in signatures.items()}
+    for feature_set in sorted(os.listdir(cache_dir)):
+        matrix_path, meta_path = entry_paths(feature_set, season, part, cache_dir)
+        meta = _read_meta(meta_path)
+        if meta is None or not os.path.exists(matrix_path):
+            continue
+        for column, feature in enumerate(meta['features']):
+            signature = meta['signatures'].get(feature)
+            if signature in wanted and wanted[signature] not in found:
+                found[wanted[signature]] = (matrix_path, column)
+    return found
+
+
+# Funzione per ottenere la matrice float32 (righe x feature) di un insieme di feature per una stagione
+# (part distingue ad esempio le righe di training e di test). Se la voce è aggiornata viene solo mappata
+# in memoria; altrimenti le colonne ancora valide vengono copiate dalla cache (anche da altri insiemi)
+# e solo le feature con firma diversa vengono ricalcolate. I valori mancanti diventano 0
+def feature_matrix(data, feature_set, season, part='train', cache_dir=FEATURE_CACHE_DIR):
+    features = FEATURE_SETS[feature_set]
+    signatures = feature_signatures(data, features)
+    matrix_path, meta_path = entry_paths(feature_set, season, part, cache_dir)
+
+    meta = _read_meta(meta_path)
+    if meta is not None and meta['features'] == features and meta['signatures'] == signatures \
+            and os.path.exists(matrix_path):
+        return np.load(matrix_path, mmap_mode='r')
+
+    matrix = np.empty((len(data), len(features)), dtype=np.float32)
+    reusable = _reusable_columns(season, part, signatures, cache_dir)
+    for column, feature in enumerate(features):
+        if feature in reusable:
+            path, source_column = reusable[feature]
+            matrix[:, column] = np.load(path, mmap_mode='r')[:, source_column]
+
+    # Le feature da ricalcolare, raggruppate per funzione di calcolo
+    stale = [feature for feature in features if feature not in reusable]
+    builders = {}
+    for feature in stale:
+        builders.setdefault(FEATURE_DEFINITIONS[feature]['builder'], []).append(feature)
+    for builder, built_features in builders.items():
+        built = builder(data, built_features)
+        for feature in built_features:
+            matrix[:, features.index(feature)] = built[feature].fillna(0).to_numpy(dtype=np.float32)
+
+    os.makedirs(os.path.dirname(matrix_path), exist_ok=True)
+    tmp_path = f'{matrix_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, matrix_path)
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'features': features, 'signatures': signatures, 'rows': len(data),
+                   'recomputed': stale}, f)
+    os.replace(tmp_path, meta_path)
+    return np.load(matrix_path, mmap_mode='r')
+
+
+# Funzione per ottenere la matrice come DataFrame con i nomi delle feature e l'indice delle righe ricevute
+def feature_frame(data, feature_set, season, part='train', cache_dir=FEATURE_CACHE_DIR):
+    matrix = feature_matrix(data, feature_set, season, part, cache_dir)
+    return pd.DataFrame(matrix, columns=FEATURE_SETS[feature_set], index=data.index)
+
+
+if __name__ == '__main__':
+    import time
+    from data_layer import load_dataset
+
+    # Solo le colonne da cui dipendono le feature, più l'anno per scegliere la stagione
+    columns = ['year'] + list(dict.fromkeys(col for definition in FEATURE_DEFINITIONS.values()
+                                            for col in definition['columns']))
+    data = load_dataset(columns=columns)
+    train_data = data[(data['year'] >= 2018) & (data['year'] < 2023)]
+
+    # Prima costruzione, lettura dalla cache e cambio di insieme di feature sulla stessa stagione
+    for feature_set in ['history', 'history', 'track', 'points']:
+        start_time = time.perf_counter()
+        matrix = feature_matrix(train_data, feature_set, 2023)
+        seconds = time.perf_counter() - start_time
+        with open(entry_paths(feature_set, 2023, 'train')[1]) as f:
+            recomputed = json.load(f)['recomputed']
+        print(f"Insieme '{feature_set}': matrice {matrix.shape} in {seconds * 1000:.1f} ms, "
+              f"feature ricalcolate nell'ultima scrittura: {recomputed}")
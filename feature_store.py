@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+import os
+
+# Dimensione della finestra mobile usata per le medie delle ultime gare
+WINDOW = 10
+
+# Percorso predefinito dello snapshot su disco
+FEATURE_STORE_PATH = 'feature_store.npz'
+
+# Versione del formato dello snapshot: gli snapshot senza versione (1) hanno somme e caratteristiche
+# falsate dai valori mancanti, quindi vanno ricostruiti
+SNAPSHOT_VERSION = 2
+
+# Colonne calcolate dallo store
+FEATURE_COLUMNS = ['previous_position', 'avg_last_10_positions', 'positions_gained', 'avg_positions_gained']
+
+
+# Store delle caratteristiche per pilota: mantiene per ogni driverId un buffer circolare
+# delle ultime WINDOW posizioni e posizioni guadagnate, con le somme correnti dei valori presenti
+# e il loro numero, in modo che ogni nuovo risultato si aggiorni in O(1). Come rolling().mean(),
+# un valore mancante occupa un posto nella finestra ma non entra nella media
+class FeatureStore:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.version = SNAPSHOT_VERSION
+        self.driver_index = {}
+        self.positions = np.zeros((0, window))
+        self.gained = np.zeros((0, window))
+        self.heads = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sum_positions = np.zeros(0)
+        self.sum_gained = np.zeros(0)
+        self.valid_positions = np.zeros(0, dtype=np.int64)
+        self.valid_gained = np.zeros(0, dtype=np.int64)
+        self.last_position = np.zeros(0)
+        # Caratteristiche già calcolate, nell'ordine in cui sono state aggiunte
+        self.result_ids = []
+        self.features = []
+
+    # Funzione per ottenere (o creare) l'indice interno di un pilota
+    def _slot(self, driver_id):
+        slot = self.driver_index.get(driver_id)
+        if slot is None:
+            slot = len(self.driver_index)
+            self.driver_index[driver_id] = slot
+            self.positions = np.vstack([self.positions, np.zeros((1, self.window))])
+            self.gained = np.vstack([self.gained, np.zeros((1, self.window))])
+            self.heads = np.append(self.heads, 0)
+            self.counts = np.append(self.counts, 0)
+            self.sum_positions = np.append(self.sum_positions, 0.0)
+            self.sum_gained = np.append(self.sum_gained, 0.0)
+            self.valid_positions = np.append(self.valid_positions, 0)
+            self.valid_gained = np.append(self.valid_gained, 0)
+            self.last_position = np.append(self.last_position, np.nan)
+        return slot
+
+    # Funzione per aggiornare lo stato con un nuovo risultato e restituire le sue caratteristiche
+    def update(self, result_id, driver_id, grid, position):
+        row = self._advance(driver_id, grid, position)
+        self.result_ids.append(result_id)
+        self.features.append(row)
+        return row
+
+    # Funzione per far avanzare lo stato di un pilota con un nuovo risultato, senza conservarne le caratteristiche
+    def _advance(self, driver_id, grid, position):
+        slot = self._slot(driver_id)
+        gained = grid - position
+        previous_position = self.last_position[slot]
+
+        # Sostituisce il valore più vecchio del buffer quando la finestra è piena
+        head = self.heads[slot]
+        if self.counts[slot] == self.window:
+            self._remove(slot, self.positions[slot, head], self.gained[slot, head])
+        else:
+            self.counts[slot] += 1
+        self.positions[slot, head] = position
+        self.gained[slot, head] = gained
+        if not np.isnan(position):
+            self.sum_positions[slot] += position
+            self.valid_positions[slot] += 1
+        if not np.isnan(gained):
+            self.sum_gained[slot] += gained
+            self.valid_gained[slot] += 1
+        self.heads[slot] = (head + 1) % self.window
+        self.last_position[slot] = position
+
+        return (previous_position, self._mean(self.sum_positions[slot], self.valid_positions[slot]), gained,
+                self._mean(self.sum_gained[slot], self.valid_gained[slot]))
+
+    # Funzione per togliere dalle somme i valori che escono dalla finestra (se non mancanti)
+    def _remove(self, slot, position, gained):
+        if not np.isnan(position):
+            self.sum_positions[slot] -= position
+            self.valid_positions[slot] -= 1
+        if not np.isnan(gained):
+            self.sum_gained[slot] -= gained
+            self.valid_gained[slot] -= 1
+
+    # Funzione per la media dei valori presenti nella finestra (NaN se sono tutti mancanti)
+    @staticmethod
+    def _mean(total, valid):
+        return total / valid if valid else np.nan
+
+    # Funzione per aggiungere allo store solo i risultati non ancora visti, nell'ordine del DataFrame
+    def update_frame(self, data):
+        known = set(self.result_ids)
+        new_rows = data[~data['resultId'].isin(known)]
+        for result_id, driver_id, grid, position in zip(new_rows['resultId'].to_numpy(), new_rows['driverId'].to_numpy(),
+                                                        new_rows['grid'].to_numpy(), new_rows['positionOrder'].to_numpy()):
+            self.update(result_id, driver_id, grid, position)
+        return len(new_rows)
+
+    # Funzione per far avanzare lo stato con tutte le righe di un blocco (nell'ordine delle gare) e restituirne
+    # le caratteristiche come array (righe x FEATURE_COLUMNS). Con record=False le caratteristiche non restano
+    # nello store, così durante lo streaming la memoria dipende solo dal numero di piloti
+    def advance_frame(self, data, record=False):
+        step = self.update if record else lambda result_id, *args: self._advance(*args)
+        rows = [step(result_id, driver_id, grid, position)
+                for result_id, driver_id, grid, position in zip(data['resultId'].to_numpy(), data['driverId'].to_numpy(),
+                                                                data['grid'].to_numpy(), data['positionOrder'].to_numpy())]
+        return np.array(rows, dtype=float).reshape(-1, len(FEATURE_COLUMNS))
+
+    # Funzione per ottenere le caratteristiche di una gara non ancora corsa per alcuni piloti, dallo stato attuale:
+    # ultima posizione e medie delle ultime WINDOW gare. I piloti senza storico hanno NaN
+    def upcoming_features(self, driver_ids):
+        slots = np.array([self.driver_index.get(int(driver_id), -1) for driver_id in driver_ids], dtype=np.int64)
+        known = slots >= 0
+        slots = slots[known]
+        frame = pd.DataFrame(np.nan, index=range(len(known)),
+                             columns=['previous_position', 'avg_last_10_positions', 'avg_positions_gained'])
+        frame.loc[known, 'previous_position'] = self.last_position[slots]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frame.loc[known, 'avg_last_10_positions'] = np.where(
+                self.valid_positions[slots] > 0, self.sum_positions[slots] / self.valid_positions[slots], np.nan)
+            frame.loc[known, 'avg_positions_gained'] = np.where(
+                self.valid_gained[slots] > 0, self.sum_gained[slots] / self.valid_gained[slots], np.nan)
+        frame.index = pd.Index(np.asarray(driver_ids), name='driverId')
+        return frame
+
+    # Funzione per ottenere le caratteristiche come DataFrame indicizzato per resultId
+    def feature_frame(self):
+        frame = pd.DataFrame(np.array(self.features, dtype=float).reshape(-1, len(FEATURE_COLUMNS)),
+                             columns=FEATURE_COLUMNS)
+        frame.index = pd.Index(np.array(self.result_ids, dtype=np.int64), name='resultId')
+        return frame
+
+    # Funzione per verificare che i risultati già nello store siano un prefisso di quelli del DataFrame
+    def is_prefix_of(self, data):
+        n = len(self.result_ids)
+        if n > len(data):
+            return False
+        return np.array_equal(np.array(self.result_ids, dtype=np.int64), data['resultId'].to_numpy()[:n])
+
+    # Funzione per salvare lo snapshot compatto su disco
+    def save(self, path=FEATURE_STORE_PATH):
+        drivers = np.array(sorted(self.driver_index, key=self.driver_index.get), dtype=np.int64)
+        # La versione resta quella dello snapshot di partenza: le caratteristiche già calcolate non cambiano
+        np.savez_compressed(path, version=self.version, window=self.window, drivers=drivers, positions=self.positions,
+                            gained=self.gained, heads=self.heads, counts=self.counts, sum_positions=self.sum_positions,
+                            sum_gained=self.sum_gained, last_position=self.last_position,
+                            result_ids=np.array(self.result_ids, dtype=np.int64),
+                            features=np.array(self.features, dtype=float).reshape(-1, len(FEATURE_COLUMNS)))
+
+    # Funzione per ricaricare lo store da uno snapshot
+    @classmethod
+    def load(cls, path=FEATURE_STORE_PATH):
+        snapshot = np.load(path)
+        store = cls(int(snapshot['window']))
+        store.driver_index = {int(driver_id): slot for slot, driver_id in enumerate(snapshot['drivers'])}
+        store.positions = snapshot['positions']
+        store.gained = snapshot['gained']
+        store.heads = snapshot['heads']
+        store.counts = snapshot['counts']
+        store.last_position = snapshot['last_position']
+        store.version = int(snapshot['version']) if 'version' in snapshot.files else 1
+        # Somme e numero di valori presenti ricavati dai buffer (i posti non ancora occupati non contano),
+        # così anche uno snapshot di una versione precedente riparte da uno stato corretto
+        filled = (np.arange(store.window)[None, :] < store.counts[:, None])
+        store.sum_positions = np.nansum(np.where(filled, store.positions, np.nan), axis=1)
+        store.sum_gained = np.nansum(np.where(filled, store.gained, np.nan), axis=1)
+        store.valid_positions = (filled & ~np.isnan(store.positions)).sum(axis=1)
+        store.valid_gained = (filled & ~np.isnan(store.gained)).sum(axis=1)
+        store.result_ids = snapshot['result_ids'].tolist()
+        store.features = [tuple(row) for row in snapshot['features']]
+        return store
+
+
+# Funzione per aggiornare lo store persistente con il DataFrame e restituire le caratteristiche per riga.
+# Se i dati già salvati non sono più un prefisso del dataset (es. righe corrette) o lo snapshot è di una
+# versione precedente, lo store viene ricostruito
+def load_features(data, path=FEATURE_STORE_PATH):
+    store = None
+    if path is not None and os.path.exists(path):
+        store = FeatureStore.load(path)
+        if store.version != SNAPSHOT_VERSION:
+            print(f"Lo store '{path}' è di una versione precedente: ricostruzione completa.")
+            store = None
+        elif not store.is_prefix_of(data):
+            print(f"Lo store '{path}' non corrisponde più ai dati: ricostruzione completa.")
+            store = None
+    if store is None:
+        store = FeatureStore()
+
+    added = store.update_frame(data)
+    if added and path is not None:
+        store.save(path)
+    return store.feature_frame().reindex(data['resultId'].to_numpy())
+
+
+# Funzione per verificare se lo snapshot esiste, è della versione attuale e contiene le caratteristiche
+# di tutti i risultati richiesti
+def snapshot_covers(result_ids, path=FEATURE_STORE_PATH):
+    if path is None or not os.path.exists(path):
+        return False
+    snapshot = np.load(path)
+    if 'version' not in snapshot.files or int(snapshot['version']) != SNAPSHOT_VERSION:
+        return False
+    return bool(np.isin(np.asarray(result_ids), snapshot['result_ids']).all())
+
+
+# Funzione per leggere dallo snapshot le caratteristiche già calcolate di alcuni risultati,
+# senza dover caricare lo storico completo (usata dal caricamento per finestre di stagioni)
+def stored_features(result_ids, path=FEATURE_STORE_PATH):
+    snapshot = np.load(path)
+    frame = pd.DataFrame(snapshot['features'], columns=FEATURE_COLUMNS,
+                         index=pd.Index(snapshot['result_ids'], name='resultId'))
+    return frame.reindex(np.asarray(result_ids))
@@ -0,0 +1,118 @@
+import pandas as pd
+import numpy as np
+from data_layer import DATASET_PATH, HAS_PYARROW, apply_types, materialize
+from feature_store import FEATURE_COLUMNS, FeatureStore
+
+# Numero di gare per blocco (circa una stagione) e righe lette dal file ad ogni passo
+CHUNK_RACES = 20
+BATCH_ROWS = 2000
+
+# Colonne sempre necessarie per far avanzare lo stato per pilota
+STATE_COLUMNS = ['raceId', 'resultId', 'driverId', 'grid', 'positionOrder']
+
+
+# Funzione per leggere il dataset a pezzi di batch_rows righe, nell'ordine del file (cioè delle gare).
+# Con Parquet si leggono solo le colonne richieste, altrimenti il CSV viene letto a blocchi
+def read_batches(columns=None, batch_rows=BATCH_ROWS, csv_path=DATASET_PATH):
+    if HAS_PYARROW:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(materialize(csv_path)).iter_batches(batch_size=batch_rows, columns=columns):
+            yield apply_types(batch.to_pandas())
+    else:
+        for batch in pd.read_csv(csv_path, usecols=columns, chunksize=batch_rows):
+            yield apply_types(batch)
+
+
+# Funzione per raggruppare dei pezzi di dataset in blocchi di races_per_chunk gare complete:
+# l'ultima gara di un pezzo può continuare nel successivo, quindi viene tenuta da parte fino al pezzo dopo
+def race_chunks(batches, races_per_chunk=CHUNK_RACES):
+    carry = None
+    for batch in batches:
+        if carry is not None:
+            batch = pd.concat([carry, batch])
+        race_ids = batch['raceId'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, race_ids[1:] != race_ids[:-1]])
+        emitted = 0
+        while len(starts) - 1 - emitted >= races_per_chunk:
+            yield batch.iloc[starts[emitted]:starts[emitted + races_per_chunk]]
+            emitted += races_per_chunk
+        carry = batch.iloc[starts[emitted]:] if len(starts) else batch
+    if carry is not None and len(carry):
+        yield carry
+
+
+# Funzione per aggiungere le caratteristiche aggiuntive a ogni blocco. Lo stato per pilota (ultime posizioni
+# e somme correnti) resta nello store tra un blocco e l'altro, quindi le medie mobili attraversano i confini
+# dei blocchi come se il dataset fosse elaborato in una volta sola. Con fill_missing=False i valori mancanti
+# restano NaN (per i backend che li gestiscono da soli)
+def stream_features(chunks, store=None, record=False, fill_missing=True):
+    store = FeatureStore() if store is None else store
+    for chunk in chunks:
+        chunk = chunk.copy()
+        chunk[FEATURE_COLUMNS] = store.advance_frame(chunk, record)
+        # Riempi i valori NaN con 0, come nel caricamento in memoria
+        yield chunk.fillna(0) if fill_missing else chunk
+
+
+# Funzione per leggere il dataset in streaming e produrre blocchi pronti per l'addestramento, solo con le
+# stagioni da start_year a end_year (gli anni precedenti servono comunque a far avanzare le medie mobili).
+# columns indica le colonne del dataset da mantenere oltre alle caratteristiche (tutte se None)
+def feature_batches(start_year=None, end_year=None, columns=None, races_per_chunk=CHUNK_RACES, store=None,
+                    csv_path=DATASET_PATH, fill_missing=True):
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys(list(columns) + STATE_COLUMNS + ['year']))
+    chunks = race_chunks(read_batches(read_columns, csv_path=csv_path), races_per_chunk)
+    for chunk in stream_features(chunks, store, fill_missing=fill_missing):
+        in_window = np.ones(len(chunk), dtype=bool)
+        if start_year is not None:
+            in_window &= chunk['year'].to_numpy() >= start_year
+        if end_year is not None:
+            in_window &= chunk['year'].to_numpy() <= end_year
+        if not in_window.any():
+            continue
+        chunk = chunk[in_window]
+        if columns is not None:
+            chunk = chunk[list(dict.fromkeys(list(columns) + FEATURE_COLUMNS))]
+        yield chunk
+
+
+# Funzione per caricare in memoria le stagioni richieste con le caratteristiche: è solo l'unione
+# dei blocchi prodotti dalla pipeline in streaming
+def load_feature_frame(start_year=None, end_year=None, columns=None, races_per_chunk=CHUNK_RACES,
+                       csv_path=DATASET_PATH, fill_missing=True):
+    batches = list(feature_batches(start_year, end_year, columns, races_per_chunk, csv_path=csv_path,
+                                   fill_missing=fill_missing))
+    if not batches:
+        return pd.DataFrame(columns=list(columns or []) + FEATURE_COLUMNS)
+    # I blocchi possono avere categorie diverse: si riallineano dopo l'unione
+    return apply_types(pd.concat(batches, ignore_index=True))
+
+
+if __name__ == '__main__':
+    import time
+    import tracemalloc
+
+    # Picco di memoria della lettura in streaming (un blocco alla volta) e del caricamento in memoria
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    n_rows = 0
+    for batch in feature_batches():
+        n_rows += len(batch)
+    stream_seconds = time.perf_counter() - start_time
+    stream_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.reset_peak()
+
+    start_time = time.perf_counter()
+    data = load_feature_frame()
+    frame_seconds = time.perf_counter() - start_time
+    frame_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    print(f"Streaming: {n_rows} righe in {stream_seconds:.2f}s, picco {stream_mb:.1f}MB | "
+          f"in memoria: {len(data)} righe in {frame_seconds:.2f}s, picco {frame_mb:.1f}MB")
+
+    # Le caratteristiche devono coincidere con quelle calcolate sull'intero dataset in una volta sola
+    store = FeatureStore()
+    store.update_frame(data)
+    expected = store.feature_frame()[FEATURE_COLUMNS].fillna(0).to_numpy()
+    print(f"Caratteristiche identiche al calcolo completo: {np.array_equal(data[FEATURE_COLUMNS].to_numpy(), expected)}")
@@ -0,0 +1,130 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, ParameterGrid
+from instrumentation import stage
+
+# Strategie di ricerca disponibili
+STRATEGIES = ('exhaustive', 'random', 'halving')
+
+# Numero massimo di fit (candidati x fold) per le strategie economiche
+FIT_BUDGET = 60
+
+# Fattore di riduzione dei candidati ad ogni turno del successive halving
+HALVING_FACTOR = 3
+
+# File con i parametri scelti e il tempo impiegato per ogni stagione
+SEARCH_REPORT_PATH = 'hyperparameter_report.csv'
+
+
+# Funzione per stimare i fit per fold del successive halving con n candidati
+def halving_fits(n_candidates, factor=HALVING_FACTOR):
+    fits = 0
+    while n_candidates > 1:
+        fits += n_candidates
+        n_candidates = int(np.ceil(n_candidates / factor))
+    return fits + n_candidates
+
+
+# Funzione per scegliere i candidati da valutare: un campione casuale della griglia,
+# con in testa i migliori parametri della stagione precedente (warm start) se presenti
+def candidate_params(param_grid, n_candidates, warm_start=None, random_state=0):
+    grid = list(ParameterGrid(param_grid))
+    rng = np.random.RandomState(random_state)
+    order = rng.permutation(len(grid))
+    candidates = [grid[i] for i in order]
+
+    if warm_start is not None and warm_start in candidates:
+        candidates.remove(warm_start)
+        candidates.insert(0, warm_start)
+
+    # Ogni candidato diventa una griglia di un solo punto
+    return [{key: [value] for key, value in params.items()} for params in candidates[:n_candidates]]
+
+
+# Funzione per cercare il miglior modello con la strategia scelta entro un budget di fit.
+# Restituisce il miglior stimatore e un dizionario con parametri scelti, numero di fit e tempo impiegato
+def search_best_model(pipeline, param_grid, X, y, strategy='exhaustive', fit_budget=FIT_BUDGET, cv=5,
+                      warm_start=None, scoring='neg_mean_squared_error', random_state=0, groups=None):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Strategia di ricerca sconosciuta: {strategy}. Valori ammessi: {STRATEGIES}")
+
+    n_splits = cv if isinstance(cv, int) else cv.get_n_splits()
+    n_total = len(ParameterGrid(param_grid))
+    start_time = time.time()
+
+    if strategy == 'exhaustive':
+        search = GridSearchCV(pipeline, param_grid, cv=cv, scoring=scoring, refit=False)
+    elif strategy == 'random':
+        n_candidates = max(1, min(n_total, fit_budget // n_splits))
+        candidates = candidate_params(param_grid, n_candidates, warm_start, random_state)
+        search = GridSearchCV(pipeline, candidates, cv=cv, scoring=scoring, refit=False)
+    else:
+        n_candidates = 1
+        while n_candidates < n_total and halving_fits(n_candidates + 1) * n_splits <= fit_budget:
+            n_candidates += 1
+        candidates = candidate_params(param_grid, n_candidates, warm_start, random_state)
+        search = HalvingGridSearchCV(pipeline, candidates, cv=cv, scoring=scoring, factor=HALVING_FACTOR,
+                                     random_state=random_state, refit=False)
+
+    with stage('cv_search', rows=len(X)):
+        search.fit(X, y, groups=groups)
+
+    # Addestramento finale con i parametri migliori, misurato come fase separata dalla ricerca.
+    # La cache dei fold vale solo durante la ricerca: il modello finale non deve riferirla
+    with stage('fit', rows=len(X)):
+        best_model = clone(pipeline).set_params(**search.best_params_)
+        if 'memory' in best_model.get_params(deep=False):
+            best_model.set_params(memory=None)
+        best_model.fit(X, y)
+
+    if strategy == 'halving':
+        n_fits = int(np.sum(search.n_candidates_)) * n_splits
+    else:
+        n_fits = len(search.cv_results_['params']) * n_splits
+
+    info = {
+        'strategy': strategy,
+        'best_params': search.best_params_,
+        'best_score': search.best_score_,
+        'n_fits': n_fits,
+        'seconds': time.time() - start_time,
+    }
+    return best_model, info
+
+
+# Funzione per leggere i migliori parametri di una stagione da un report salvato, da usare come warm start
+def load_warm_start(year, path=SEARCH_REPORT_PATH):
+    if not os.path.exists(path):
+        return None
+    report = pd.read_csv(path)
+    report = report[report['year'] == year]
+    if report.empty:
+        return None
+    row = report.iloc[-1]
+    return {col[len('param_'):]: _parse_value(row[col]) for col in report.columns if col.startswith('param_') and pd.notna(row[col])}
+
+
+# Funzione per riconvertire i valori letti dal CSV nei tipi usati dalla griglia
+def _parse_value(value):
+    if isinstance(value, str):
+        return value
+    if float(value).is_integer():
+        return int(value)
+    return float(value)
+
+
+# Funzione per salvare il report della ricerca per ogni stagione
+def save_report(infos, path=SEARCH_REPORT_PATH):
+    rows = []
+    for year, info in infos:
+        row = {'year': year, 'strategy': info['strategy'], 'best_score': info['best_score'],
+               'n_fits': info['n_fits'], 'seconds': info['seconds'], 'cached': info.get('cached', False)}
+        row.update({f'param_{key}': value for key, value in info['best_params'].items()})
+        rows.append(row)
+    report = pd.DataFrame(rows)
+    report.to_csv(path, index=False)
+    return report
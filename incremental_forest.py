@@ -0,0 +1,214 @@
+import pandas as pd
+import numpy as np
+import functools
+import time
+from sklearn.base import clone
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from algoritmo5BEST import SEARCH_STRATEGY, create_features_and_labels, fit_model, load_season_data, \
+    prepare_data_for_year, update_feature_store
+from backtest import N_WORKERS, run_backtest
+from data_layer import materialize_partitions, save_predictions
+from hyperparameter_search import load_warm_start
+from instrumentation import stage
+from race_cv import race_order
+from ranking import rank_within_races
+from scoring import points_for_positions
+from season_simulator import prediction_spread
+
+# Alberi aggiunti dopo ogni gara; altrettanti alberi, i più vecchi, escono dalla foresta
+TREES_PER_RACE = 10
+
+# Gare più recenti (compresa quella appena corsa) su cui vengono addestrati gli alberi aggiunti:
+# circa una stagione, così i nuovi alberi seguono la forma recente ma hanno abbastanza righe per generalizzare
+RECENT_RACES = 20
+
+# Ogni quante gare della stagione ripetere la ricerca completa degli iperparametri
+FULL_REFIT_EVERY = 10
+
+# Se True dopo ogni gara si addestra anche una foresta da zero sulla stessa finestra, per confrontarne l'accuratezza
+TRACK_FULL_REFIT = True
+
+# Log gara per gara degli aggiornamenti e predizioni della stagione ottenute con gli aggiornamenti incrementali
+INCREMENTAL_LOG_PATH = 'incremental_log.csv'
+INCREMENTAL_PREDICTIONS_PATH = 'predicted_results_incremental.csv'
+
+
+# Funzione per ottenere la foresta di una pipeline: solo le foreste possono aggiungere e togliere alberi
+def forest_of(model):
+    forest = model[-1] if hasattr(model, 'steps') else model
+    if not isinstance(forest, (RandomForestRegressor, ExtraTreesRegressor)):
+        raise ValueError(f"L'aggiornamento incrementale richiede una foresta, non {type(forest).__name__}")
+    return forest
+
+
+# Funzione per aggiungere alla foresta n_trees alberi addestrati su X, y con warm_start.
+# Imputazione e standardizzazione restano quelle già addestrate, così i nuovi alberi
+# vedono le feature nella stessa scala di quelli esistenti
+def add_trees(model, X, y, n_trees=TREES_PER_RACE):
+    forest = forest_of(model)
+    Xt = model[:-1].transform(X) if hasattr(model, 'steps') else X
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_trees)
+    try:
+        forest.fit(Xt, y)
+    finally:
+        forest.set_params(warm_start=False)
+    return model
+
+
+# Funzione per togliere gli n_trees alberi più vecchi (warm_start aggiunge i nuovi in fondo alla lista)
+def age_out(model, n_trees=TREES_PER_RACE):
+    forest = forest_of(model)
+    n_trees = min(n_trees, len(forest.estimators_) - 1)
+    forest.estimators_ = forest.estimators_[n_trees:]
+    forest.set_params(n_estimators=len(forest.estimators_))
+    return model
+
+
+# Funzione per aggiornare la foresta dopo una gara: entrano n_trees alberi nuovi ed escono i più vecchi,
+# così la dimensione della foresta resta costante
+def update_model(model, X, y, n_trees=TREES_PER_RACE):
+    return age_out(add_trees(model, X, y, n_trees), n_trees)
+
+
+# Funzione per tenere solo le righe delle ultime n_races gare
+def last_races(data, n_races):
+    keys = race_order(data)
+    return data[keys >= np.unique(keys)[-n_races]]
+
+
+# Funzione per far scorrere la finestra di training: entrano le righe di una gara ed escono le gare
+# più vecchie, così la finestra contiene sempre n_races gare
+def slide_window(window, race, n_races):
+    return last_races(pd.concat([window, race]), n_races)
+
+
+# Funzione per misurare l'accuratezza delle predizioni di una gara: errore medio sulla posizione predetta,
+# posizioni esatte ed entro una posizione dell'ordine d'arrivo predetto
+def race_accuracy(prefix, y_true, y_pred):
+    y_true = np.asarray(y_true)
+    ranks = rank_within_races(np.zeros(len(y_pred), dtype=np.int64), y_pred)
+    return {
+        f'{prefix}_mae': np.mean(np.abs(y_pred - y_true)),
+        f'{prefix}_exact': np.mean(ranks == y_true),
+        f'{prefix}_within_one': np.mean(np.abs(ranks - y_true) <= 1),
+    }
+
+
+# Funzione per simulare una stagione gara per gara: ogni gara viene predetta con il modello disponibile
+# prima della gara, poi entra nella finestra di training. Il modello viene aggiornato con update_model
+# sulle ultime recent_races gare della finestra, e ogni refit_every gare fit(finestra) ripete la ricerca completa. Con track_full_refit ogni gara viene
+# predetta anche da una foresta con gli stessi parametri addestrata da zero sulla stessa finestra.
+# Restituisce predizioni e dispersione per le righe di test_data e il log degli aggiornamenti
+def live_season(train_data, test_data, fit, target_col='positionOrder', trees_per_race=TREES_PER_RACE,
+                recent_races=RECENT_RACES, refit_every=FULL_REFIT_EVERY, track_full_refit=TRACK_FULL_REFIT, season=None):
+    model, _ = fit(train_data)
+    n_races = len(np.unique(race_order(train_data)))
+    keys = race_order(test_data)
+    races = np.unique(keys)
+
+    y_pred = np.empty(len(test_data))
+    y_std = np.empty(len(test_data))
+    window = train_data
+    reference = model
+    source, updates, update_seconds, refit_seconds = 'search', 0, np.nan, np.nan
+    rows = []
+    for i, key in enumerate(races):
+        in_race = keys == key
+        race = test_data[in_race]
+        X_race, y_race = create_features_and_labels(race, target_col)
+        with stage('predict', season=season, rows=len(race)):
+            y_pred[in_race] = model.predict(X_race)
+            y_std[in_race] = prediction_spread(model, X_race)
+
+        row = {'year': season, 'raceId': int(race['raceId'].iloc[0]), 'race': i + 1, 'model': source,
+               'updates_since_search': updates, 'update_seconds': update_seconds}
+        row.update(race_accuracy('incremental', y_race, y_pred[in_race]))
+        if track_full_refit:
+            row['full_refit_seconds'] = refit_seconds
+            row.update(race_accuracy('full', y_race, reference.predict(X_race)))
+        rows.append(row)
+        if i == len(races) - 1:
+            break
+
+        # La gara appena corsa entra nella finestra di training e il modello viene aggiornato per la successiva:
+        # i nuovi alberi imparano solo dalle gare recenti, quelli vecchi che escono dalle gare più lontane
+        window = slide_window(window, race, n_races)
+        X_window, y_window = create_features_and_labels(window, target_col)
+        start_time = time.perf_counter()
+        if (i + 1) % refit_every == 0:
+            model, _ = fit(window)
+            source, updates = 'search', 0
+        else:
+            recent = last_races(window, recent_races)
+            X_recent, y_recent = create_features_and_labels(recent, target_col)
+            with stage('incremental_update', season=season, rows=len(recent)):
+                update_model(model, X_recent, y_recent, trees_per_race)
+            source, updates = 'incremental', updates + 1
+        update_seconds = time.perf_counter() - start_time
+
+        if track_full_refit:
+            start_time = time.perf_counter()
+            with stage('full_refit', season=season, rows=len(window)):
+                reference = clone(model).fit(X_window, y_window)
+            refit_seconds = time.perf_counter() - start_time
+
+    return y_pred, y_std, pd.DataFrame(rows)
+
+
+# Funzione per prevedere una stagione con gli aggiornamenti incrementali (stessa interfaccia di
+# predict_season di algoritmo5BEST, ma restituisce il log degli aggiornamenti al posto del report della ricerca)
+def predict_season_incremental(data, year):
+    if data is None:
+        data = load_season_data(year)
+
+    train_data, test_data = prepare_data_for_year(data, year)
+
+    if train_data.empty or test_data.empty:
+        print(f'Anno {year}: dati insufficienti per addestramento o test.')
+        return None
+
+    # Stesso warm start della ricerca di algoritmo5BEST
+    warm_start = load_warm_start(year - 1) if SEARCH_STRATEGY != 'exhaustive' else None
+    fit = functools.partial(fit_model, target_col='positionOrder', warm_start=warm_start, season=year)
+
+    test_data = test_data.copy()
+    y_pred, y_std, log = live_season(train_data, test_data, fit, season=year)
+    test_data['predicted_positionOrder'] = y_pred
+    test_data['predicted_rank'] = rank_within_races(test_data['raceId'].to_numpy(), y_pred)
+    test_data['predicted_resultPoints'] = points_for_positions(test_data['predicted_rank'])
+    test_data['predicted_positionStd'] = y_std
+    return test_data, log
+
+
+# Funzione per riassumere il log per stagione: tempo medio di un aggiornamento incrementale, di una ricerca
+# programmata e di una foresta addestrata da zero, e accuratezza media dei due modelli
+def summarize_updates(log):
+    incremental = log[log['model'] == 'incremental']
+    searched = log[(log['model'] == 'search') & log['update_seconds'].notna()]
+    summary = pd.DataFrame({
+        'incremental_update_seconds': incremental.groupby('year')['update_seconds'].mean(),
+        'scheduled_search_seconds': searched.groupby('year')['update_seconds'].mean(),
+    })
+    accuracy_columns = [col for col in log.columns if col.endswith(('_mae', '_exact', '_within_one'))]
+    if 'full_refit_seconds' in log.columns:
+        accuracy_columns = ['full_refit_seconds'] + accuracy_columns
+    summary = summary.join(log.groupby('year')[accuracy_columns].mean())
+    return summary.reset_index()
+
+
+if __name__ == '__main__':
+    update_feature_store()
+    materialize_partitions()
+
+    years = range(2018, 2024)
+    all_predictions, logs = run_backtest(None, years, predict_season_incremental, n_workers=N_WORKERS)
+
+    if logs:
+        log = pd.concat([season_log for _, season_log in logs], ignore_index=True)
+        log.to_csv(INCREMENTAL_LOG_PATH, index=False)
+        print(summarize_updates(log).to_string(index=False))
+        print(f"Il log degli aggiornamenti è stato salvato in '{INCREMENTAL_LOG_PATH}'.")
+
+    if all_predictions is not None:
+        save_predictions(all_predictions, INCREMENTAL_PREDICTIONS_PATH)
+        print(f"Le predizioni sono state salvate in '{INCREMENTAL_PREDICTIONS_PATH}'.")
@@ -0,0 +1,225 @@
+import pandas as pd
+import numpy as np
+import cProfile
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+# Log strutturato delle fasi (una riga JSON per fase) e riepilogo in CSV
+RUN_LOG_PATH = 'run_log.jsonl'
+RUN_SUMMARY_PATH = 'run_summary.csv'
+
+# Profilo cProfile della fase più lenta (leggibile con pstats, snakeviz, ...) e file con la sua durata
+PROFILE_PATH = 'slowest_stage.prof'
+
+# Variabili d'ambiente condivise con i processi del backtest: identificativo dell'esecuzione e profilazione
+RUN_ID_ENV = 'PIPELINE_RUN_ID'
+PROFILE_ENV = 'PIPELINE_PROFILE'
+
+# File di /proc con la memoria del processo (Linux): scrivendo 5 in clear_refs il picco VmHWM riparte
+# dalla memoria residente attuale, così ogni fase può misurare il proprio picco
+PROC_STATUS_PATH = '/proc/self/status'
+PROC_CLEAR_REFS_PATH = '/proc/self/clear_refs'
+
+# Fasi aperte nel processo corrente: si profila solo la fase più esterna,
+# e le fasi annidate ereditano la stagione di quella che le contiene
+_open_stages = []
+
+# Picco di memoria di ogni fase aperta dal suo inizio (None se il picco di /proc non si può azzerare)
+_open_peaks = []
+
+# Picco del processo già osservato: azzerare VmHWM azzera anche ru_maxrss, quindi il picco
+# di tutta la vita del processo viene conservato qui
+_process_peak = 0.0
+
+
+# Funzione per ottenere l'identificativo dell'esecuzione, creato dal primo processo e ereditato dagli altri
+def run_id():
+    if RUN_ID_ENV not in os.environ:
+        os.environ[RUN_ID_ENV] = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    return os.environ[RUN_ID_ENV]
+
+
+# Funzione per attivare la profilazione delle fasi (anche nei processi avviati dopo la chiamata)
+def enable_profiling():
+    os.environ[PROFILE_ENV] = '1'
+
+
+# Funzione per leggere da /proc la memoria residente attuale e il picco dall'ultimo azzeramento, in MB
+# (None se non disponibili, es. fuori da Linux)
+def _proc_memory():
+    try:
+        with open(PROC_STATUS_PATH) as f:
+            values = {line.split(':')[0]: int(line.split()[1]) / 1024 for line in f
+                      if line.startswith(('VmRSS:', 'VmHWM:'))}
+        return values['VmRSS'], values['VmHWM']
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# Funzione per azzerare il picco di /proc alla memoria attuale (False se non consentito)
+def _reset_peak():
+    try:
+        with open(PROC_CLEAR_REFS_PATH, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# Funzione per leggere la memoria residente attuale del processo in MB (None se non disponibile)
+def current_rss_mb():
+    memory = _proc_memory()
+    return None if memory is None else memory[0]
+
+
+# Funzione per leggere il picco di memoria residente di tutta la vita del processo in MB (None se non disponibile)
+def peak_rss_mb():
+    global _process_peak
+    memory = _proc_memory()
+    if memory is None and not HAS_RESOURCE:
+        return None
+    if memory is not None:
+        _process_peak = max(_process_peak, memory[1])
+    if HAS_RESOURCE:
+        # ru_maxrss è in KB su Linux
+        _process_peak = max(_process_peak, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    return _process_peak
+
+
+# Funzione per aggiornare il picco delle fasi aperte con il picco di /proc dall'ultimo azzeramento
+def _update_open_peaks():
+    memory = _proc_memory()
+    if memory is not None:
+        for i, peak in enumerate(_open_peaks):
+            if peak is not None:
+                _open_peaks[i] = max(peak, memory[1])
+
+
+# Funzione per salvare il profilo di una fase se è la più lenta registrata finora in questa esecuzione
+def _save_if_slowest(profiler, record, profile_path):
+    info_path = f'{profile_path}.json'
+    if os.path.exists(info_path):
+        with open(info_path) as f:
+            slowest = json.load(f)
+        if slowest['run_id'] == record['run_id'] and slowest['wall_seconds'] >= record['wall_seconds']:
+            return
+    profiler.dump_stats(profile_path)
+    with open(info_path, 'w') as f:
+        json.dump({key: record[key] for key in ['run_id', 'stage', 'season', 'wall_seconds']}, f)
+
+
+# Context manager per misurare una fase della pipeline: tempo reale, tempo CPU, memoria e numero di righe
+# (che il codice della fase può impostare con record['rows'] = ...). Il picco dell'intera vita del processo
+# è in process_peak_rss_mb; in peak_rss_increase_mb c'è quanto il picco della fase ha superato la memoria
+# residente all'inizio della fase (start_rss_mb), misurato azzerando il picco di /proc all'inizio della fase.
+# Dove non si può azzerare, è quanto la fase ha fatto crescere il picco del processo.
+# Alla fine la fase viene aggiunta come riga JSON al log dell'esecuzione
+@contextmanager
+def stage(name, season=None, rows=None, log_path=RUN_LOG_PATH, profile_path=PROFILE_PATH):
+    if season is None and _open_stages:
+        season = _open_stages[-1]['season']
+    record = {'run_id': run_id(), 'pid': os.getpid(), 'stage': name,
+              'season': None if season is None else int(season), 'rows': rows}
+
+    profiler = None
+    if not _open_stages and os.environ.get(PROFILE_ENV) == '1':
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # Prima di azzerare il picco di /proc, il picco raggiunto finora va nel picco del processo e delle fasi aperte
+    start_peak = peak_rss_mb()
+    _update_open_peaks()
+    record['start_rss_mb'] = current_rss_mb()
+    measured = record['start_rss_mb'] is not None and _reset_peak()
+    _open_stages.append(record)
+    _open_peaks.append(record['start_rss_mb'] if measured else None)
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = time.perf_counter() - start_wall
+        record['cpu_seconds'] = time.process_time() - start_cpu
+        record['process_peak_rss_mb'] = peak_rss_mb()
+        _update_open_peaks()
+        stage_peak = _open_peaks.pop()
+        if stage_peak is not None:
+            record['peak_rss_increase_mb'] = stage_peak - record['start_rss_mb']
+        else:
+            record['peak_rss_increase_mb'] = None if start_peak is None else record['process_peak_rss_mb'] - start_peak
+        record['rows'] = None if record['rows'] is None else int(record['rows'])
+        _open_stages.pop()
+
+        if profiler is not None:
+            profiler.disable()
+            _save_if_slowest(profiler, record, profile_path)
+        if log_path is not None:
+            # Una sola scrittura in append per riga, così i processi paralleli non mescolano le righe
+            with open(log_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+# Decoratore equivalente a stage: rows può essere una funzione che riceve il risultato (es. len)
+# e season il nome di un argomento della funzione decorata
+def timed(name, rows=None, season=None):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            season_value = None
+            if season is not None:
+                arguments = dict(zip(function.__code__.co_varnames, args), **kwargs)
+                season_value = arguments.get(season)
+            with stage(name, season=season_value) as record:
+                result = function(*args, **kwargs)
+                if rows is not None and result is not None:
+                    record['rows'] = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+# Funzione per leggere il log delle fasi, solo dell'esecuzione indicata (l'ultima se None)
+def load_run_log(log_path=RUN_LOG_PATH, run=None):
+    log = pd.read_json(log_path, lines=True)
+    run = log['run_id'].iloc[-1] if run is None else run
+    return log[log['run_id'] == run].reset_index(drop=True)
+
+
+# Funzione per riassumere un'esecuzione per fase e stagione e salvarla in CSV
+def summarize_run(log_path=RUN_LOG_PATH, summary_path=RUN_SUMMARY_PATH, run=None):
+    log = load_run_log(log_path, run)
+    # Le esecuzioni registrate prima della separazione dei due campi hanno solo il picco del processo
+    log = log.rename(columns={'peak_rss_mb': 'process_peak_rss_mb'})
+    if 'peak_rss_increase_mb' not in log.columns:
+        log['peak_rss_increase_mb'] = np.nan
+    summary = log.groupby(['stage', 'season'], dropna=False).agg(
+        calls=('wall_seconds', 'size'), wall_seconds=('wall_seconds', 'sum'), cpu_seconds=('cpu_seconds', 'sum'),
+        process_peak_rss_mb=('process_peak_rss_mb', 'max'), peak_rss_increase_mb=('peak_rss_increase_mb', 'max'),
+        rows=('rows', 'sum')).reset_index()
+    summary = summary.sort_values(by='wall_seconds', ascending=False)
+    if summary_path is not None:
+        summary.to_csv(summary_path, index=False)
+    return summary
+
+
+if __name__ == '__main__':
+    import pstats
+    import sys
+
+    # Riepilogo dell'ultima esecuzione (o di quella indicata) e funzioni più costose della fase più lenta
+    summary = summarize_run(run=sys.argv[1] if len(sys.argv) > 1 else None)
+    print(summary.to_string(index=False))
+    print(f"Il riepilogo delle fasi è stato salvato in '{RUN_SUMMARY_PATH}'.")
+    if os.path.exists(PROFILE_PATH):
+        with open(f'{PROFILE_PATH}.json') as f:
+            print(f"Fase più lenta profilata: {json.load(f)}")
+        pstats.Stats(PROFILE_PATH).sort_stats('cumulative').print_stats(15)
@@ -0,0 +1,130 @@
+import pandas as pd
+import os
+import time
+import tracemalloc
+from instrumentation import timed
+
+# Colonne lette da ogni tabella Ergast, con tipi compatti; le altre colonne non vengono caricate
+TABLE_COLUMNS = {
+    'races': {'raceId': 'int32', 'year': 'int16', 'round': 'int16', 'circuitId': 'int32', 'name': 'str', 'date': 'str'},
+    'results': {'resultId': 'int32', 'raceId': 'int32', 'driverId': 'int32', 'constructorId': 'int32', 'grid': 'int16',
+                'positionOrder': 'int16', 'points': 'float32', 'laps': 'int16', 'time': 'str', 'statusId': 'int16'},
+    'drivers': {'driverId': 'int32', 'forename': 'str', 'surname': 'str', 'nationality': 'str'},
+    'constructors': {'constructorId': 'int32', 'name': 'str', 'nationality': 'str'},
+    'circuits': {'circuitId': 'int32', 'name': 'str', 'location': 'str', 'country': 'str'},
+    'status': {'statusId': 'int16', 'status': 'str'},
+    'driver_standings': {'raceId': 'int32', 'driverId': 'int32', 'points': 'float32', 'position': 'float32', 'wins': 'float32'},
+    'constructor_standings': {'raceId': 'int32', 'constructorId': 'int32', 'points': 'float32', 'position': 'float32', 'wins': 'float32'},
+}
+
+# Colonne delle tabelle dimensione (una riga per chiave) e nome che assumono nel dataset finale
+DIMENSIONS = [
+    ('drivers', 'driverId', {'forename': 'driverForename', 'surname': 'driverSurname', 'nationality': 'driverNationality'}, True),
+    ('constructors', 'constructorId', {'name': 'constructorName', 'nationality': 'constructorNationality'}, True),
+    ('circuits', 'circuitId', {'name': 'circuitName', 'location': 'circuitLocation', 'country': 'circuitCountry'}, True),
+    ('status', 'statusId', {'status': 'raceStatus'}, False),
+]
+
+# Classifiche unite per (raceId, chiave) con i nomi finali delle colonne
+STANDINGS = [
+    ('driver_standings', 'driverId', {'points': 'driverPoints', 'position': 'driverPosition', 'wins': 'driverWins'}),
+    ('constructor_standings', 'constructorId', {'points': 'constructorPoints', 'position': 'constructorPosition', 'wins': 'constructorWins'}),
+]
+
+# Colonne del dataset finale, nell'ordine di final_data_sorted.csv
+FINAL_COLUMNS = [
+    'circuitId', 'circuitName', 'circuitLocation', 'circuitCountry',
+    'constructorId', 'constructorName', 'constructorNationality', 'constructorPoints', 'constructorPosition', 'constructorWins',
+    'driverId', 'driverForename', 'driverSurname', 'driverNationality', 'driverPoints', 'driverPosition', 'driverWins',
+    'raceId', 'year', 'round', 'raceName', 'date',
+    'resultId', 'grid', 'positionOrder', 'resultPoints', 'laps', 'resultTime', 'raceStatus'
+]
+
+
+# Funzione per misurare durata e picco di memoria di ogni passo della costruzione
+class StepTimer:
+    def __init__(self):
+        self.steps = []
+
+    def run(self, name, function, *args, **kwargs):
+        tracemalloc.reset_peak()
+        start_time = time.perf_counter()
+        result = function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        self.steps.append({'step': name, 'seconds': time.perf_counter() - start_time, 'peak_mb': peak / 1024 ** 2})
+        return result
+
+    def report(self):
+        return pd.DataFrame(self.steps)
+
+
+# Funzione per leggere una tabella Ergast con solo le colonne e i tipi necessari
+def read_table(source_dir, name, suffix=''):
+    columns = TABLE_COLUMNS[name]
+    return pd.read_csv(os.path.join(source_dir, f'{name}{suffix}.csv'), usecols=list(columns), dtype=columns)
+
+
+# Funzione per aggiungere le colonne di una tabella dimensione tramite lookup sulla chiave (map),
+# senza copiare il DataFrame come farebbe un merge. Con inner=True le righe senza corrispondenza
+# vengono scartate, come nel merge interno originale
+def add_dimension(data, table, key, columns, inner=True):
+    table = table.set_index(key)
+    if inner:
+        mask = data[key].isin(table.index)
+        if not mask.all():
+            data = data[mask].copy()
+    for source, target in columns.items():
+        data[target] = data[key].map(table[source])
+    return data
+
+
+# Funzione per aggiungere una classifica (left join su raceId e chiave) tramite reindex sull'indice composto
+def add_standings(data, table, key, columns):
+    table = table.set_index(['raceId', key])
+    lookup = table.reindex(pd.MultiIndex.from_arrays([data['raceId'], data[key]]))
+    for source, target in columns.items():
+        data[target] = lookup[source].to_numpy()
+    return data
+
+
+# Funzione per costruire il dataset finale. Il filtro sugli anni (o sulle gare) viene applicato
+# subito alle gare, e risultati e classifiche vengono ridotti a quelle gare prima di ogni unione.
+# Restituisce il dataset e la tabella con tempo e picco di memoria di ogni passo
+@timed('join', rows=lambda result: len(result[0]))
+def build_final_data(source_dir='.', min_year=2013, race_ids=None, suffix=''):
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    timer = StepTimer()
+
+    races = timer.run('carica races', read_table, source_dir, 'races', suffix)
+    races = races[races['year'] >= min_year]
+    if race_ids is not None:
+        races = races[races['raceId'].isin(race_ids)]
+    races = races.rename(columns={'name': 'raceName'}).set_index('raceId')
+
+    results = timer.run('carica results', read_table, source_dir, 'results', suffix)
+    data = results[results['raceId'].isin(races.index)].rename(columns={'points': 'resultPoints', 'time': 'resultTime'})
+    del results
+
+    def join_races(data):
+        data = data.copy()
+        for col in ['year', 'round', 'circuitId', 'raceName', 'date']:
+            data[col] = data['raceId'].map(races[col])
+        return data
+    data = timer.run('unisci races', join_races, data)
+
+    for name, key, columns, inner in DIMENSIONS:
+        table = timer.run(f'carica {name}', read_table, source_dir, name, suffix)
+        data = timer.run(f'unisci {name}', add_dimension, data, table, key, columns, inner)
+
+    for name, key, columns in STANDINGS:
+        table = timer.run(f'carica {name}', read_table, source_dir, name, suffix)
+        table = table[table['raceId'].isin(races.index)]
+        data = timer.run(f'unisci {name}', add_standings, data, table, key, columns)
+
+    data = timer.run('ordina', lambda data: data.sort_values(by=['year', 'raceId', 'positionOrder'])[FINAL_COLUMNS], data)
+
+    if not tracing:
+        tracemalloc.stop()
+    return data.reset_index(drop=True), timer.report()
@@ -0,0 +1,79 @@
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Backend predefinito
+DEFAULT_BACKEND = 'random_forest'
+
+# Griglie di iperparametri per la ricerca di ogni backend
+RANDOM_FOREST_GRID = {
+    'model__n_estimators': [100, 200],
+    'model__max_features': ['sqrt', 'log2'],
+    'model__max_depth': [10, 20, 30],
+    'model__min_samples_split': [2, 5],
+    'model__min_samples_leaf': [1, 2]
+}
+
+HIST_GB_GRID = {
+    'model__learning_rate': [0.05, 0.1],
+    'model__max_iter': [100, 200],
+    'model__max_leaf_nodes': [15, 31],
+    'model__min_samples_leaf': [20, 50],
+}
+
+
+# Pipeline della RandomForest attuale: imputazione, standardizzazione e modello
+def random_forest_pipeline():
+    return Pipeline([
+        ('imputer', SimpleImputer(strategy='mean')),  # Imputazione dei valori mancanti
+        ('scaler', StandardScaler()),  # Standardizzazione delle feature
+        ('model', RandomForestRegressor())  # Modello di RandomForest
+    ])
+
+
+# Pipeline del gradient boosting ad istogrammi: gestisce da solo i valori mancanti e non dipende
+# dalla scala delle feature, quindi non servono né imputazione né standardizzazione
+def hist_gb_pipeline():
+    return Pipeline([
+        ('model', HistGradientBoostingRegressor())
+    ])
+
+
+# Backend disponibili: funzione che crea la pipeline, griglia per la ricerca e se il modello riceve
+# le feature con i valori mancanti (NaN) invece che riempiti con 0
+BACKENDS = {
+    'random_forest': {
+        'pipeline': random_forest_pipeline,
+        'param_grid': RANDOM_FOREST_GRID,
+        'keeps_missing': False,
+    },
+    'hist_gb': {
+        'pipeline': hist_gb_pipeline,
+        'param_grid': HIST_GB_GRID,
+        'keeps_missing': True,
+    },
+}
+
+
+# Funzione per ottenere pipeline e griglia di un backend
+def make_backend(name=DEFAULT_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Backend sconosciuto: {name}. Valori ammessi: {tuple(BACKENDS)}")
+    backend = BACKENDS[name]
+    return backend['pipeline'](), backend['param_grid']
+
+
+# Funzione per sapere se un backend gestisce da solo i valori mancanti: in quel caso le feature restano NaN,
+# sia nel training sia nelle predizioni
+def keeps_missing(name=DEFAULT_BACKEND):
+    return BACKENDS[name]['keeps_missing']
+
+
+# Funzione per riconoscere il backend di un modello addestrato dal tipo del suo ultimo passo (None se sconosciuto)
+def backend_of(model):
+    final = model[-1] if hasattr(model, 'steps') else model
+    for name, backend in BACKENDS.items():
+        if type(final) is type(backend['pipeline']()[-1]):
+            return name
+    return None
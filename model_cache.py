@@ -0,0 +1,103 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import joblib
+
+# Cartella della cache dei modelli e dimensione massima occupata su disco
+MODEL_CACHE_DIR = 'model_cache'
+MODEL_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+
+# Funzione per calcolare la chiave di cache: hash delle righe di training, della lista di feature
+# e della configurazione della ricerca (pipeline, griglia, strategia, budget...)
+def cache_key(X_train, y_train, config):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(X_train.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(X_train, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y_train)), index=False).to_numpy().tobytes())
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+# Funzione per ottenere il percorso del file di una voce della cache
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f'{key}.joblib')
+
+
+# Funzione per caricare un modello dalla cache. I file non sono compressi, così gli array
+# degli alberi vengono mappati in memoria invece di essere letti interamente.
+# Restituisce il dizionario salvato oppure None se la chiave non è presente
+def load_model(key, cache_dir=MODEL_CACHE_DIR):
+    path = _entry_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        entry = joblib.load(path, mmap_mode='r')
+    except Exception as e:
+        print(f"Voce di cache '{key}' non leggibile, verrà ricalcolata: {e}")
+        os.remove(path)
+        return None
+    # Aggiorna la data di modifica per l'eviction LRU
+    os.utime(path)
+    return entry
+
+
+# Funzione per salvare un modello nella cache insieme ai suoi metadati ed applicare l'eviction
+def save_model(key, model, metadata=None, cache_dir=MODEL_CACHE_DIR, max_bytes=MODEL_CACHE_MAX_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump({'model': model, 'metadata': metadata or {}}, tmp_path)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_bytes)
+
+
+# Funzione per ottenere il percorso del file che indica la voce della cache con il modello di una stagione
+def _season_path(year, cache_dir):
+    return os.path.join(cache_dir, f'season-{year}.json')
+
+
+# Funzione per registrare quale voce della cache contiene il modello addestrato per una stagione.
+# Ogni stagione ha il proprio file, così i processi del backtest non scrivono mai sullo stesso file
+def register_season(year, key, cache_dir=MODEL_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _season_path(year, cache_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'year': int(year), 'key': key}, f)
+    os.replace(tmp_path, path)
+
+
+# Funzione per elencare le stagioni registrate: dizionario {anno: chiave}, solo per le voci ancora in cache
+def season_keys(cache_dir=MODEL_CACHE_DIR):
+    keys = {}
+    if not os.path.isdir(cache_dir):
+        return keys
+    for name in sorted(os.listdir(cache_dir)):
+        if name.startswith('season-') and name.endswith('.json'):
+            with open(os.path.join(cache_dir, name)) as f:
+                entry = json.load(f)
+            if os.path.exists(_entry_path(entry['key'], cache_dir)):
+                keys[entry['year']] = entry['key']
+    return keys
+
+
+# Funzione per eliminare le voci usate meno di recente finché la cache non rientra nella dimensione massima
+def evict(cache_dir=MODEL_CACHE_DIR, max_bytes=MODEL_CACHE_MAX_BYTES):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.joblib'):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in entries:
+        # La voce più recente resta sempre, anche se da sola supera il limite
+        if total <= max_bytes or name == entries[-1][2]:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+    return total
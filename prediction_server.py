@@ -0,0 +1,232 @@
+import pandas as pd
+import numpy as np
+import json
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from algoritmo5BEST import MODEL_FEATURES
+from compact_forest import COMPACT_MODEL_DIR, load_season_models
+from feature_store import FEATURE_STORE_PATH, FeatureStore
+from model_backends import backend_of, keeps_missing
+from model_cache import MODEL_CACHE_DIR, load_model, season_keys
+from ranking import rank_within_races
+from scoring import points_for_positions
+from whatif import whatif
+
+# Indirizzo e porta predefiniti del server
+HOST = '127.0.0.1'
+PORT = 8000
+
+# Attesa massima (in secondi) per raccogliere altre richieste nello stesso batch, e dimensione massima del batch
+BATCH_WAIT = 0.002
+MAX_BATCH_ROWS = 10_000
+
+
+# Modelli per stagione e store delle caratteristiche, caricati una sola volta all'avvio
+class PredictionModels:
+    def __init__(self, store_path=FEATURE_STORE_PATH, cache_dir=MODEL_CACHE_DIR, compact_dir=COMPACT_MODEL_DIR):
+        self.store = FeatureStore.load(store_path)
+        # Prima i modelli compatti (caricamento quasi immediato), poi la cache completa per le stagioni mancanti
+        self.models = load_season_models(compact_dir, cache_dir) if compact_dir is not None else {}
+        for year, key in season_keys(cache_dir).items():
+            if year in self.models:
+                continue
+            entry = load_model(key, cache_dir)
+            if entry is not None:
+                self.models[year] = entry['model']
+        if not self.models:
+            raise RuntimeError(f"Nessun modello di stagione registrato in '{cache_dir}': eseguire prima algoritmo5BEST.py")
+        self.latest = max(self.models)
+
+    # Funzione per costruire le righe di feature di una gara a partire dalla griglia di partenza {driverId: grid},
+    # per il modello della stagione year (l'ultima se None)
+    def features_for_grid(self, grid, year=None):
+        driver_ids = np.array([int(driver_id) for driver_id in grid], dtype=np.int64)
+        features = self.store.upcoming_features(driver_ids).reset_index()
+        features['grid'] = np.array([grid[driver_id] for driver_id in grid], dtype=float)
+        # Stessa gestione dei valori mancanti usata nel training del modello
+        backend = backend_of(self.models[self.latest if year is None else year])
+        if backend is None or not keeps_missing(backend):
+            features = features.fillna(0)
+        return driver_ids, features[MODEL_FEATURES]
+
+
+# Thread che raccoglie le richieste concorrenti e le predice con una sola chiamata a predict per stagione
+class MicroBatcher:
+    def __init__(self, models, batch_wait=BATCH_WAIT, max_batch_rows=MAX_BATCH_ROWS):
+        self.models = models
+        self.batch_wait = batch_wait
+        self.max_batch_rows = max_batch_rows
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # Funzione per predire le righe di una richiesta, bloccando finché il batch che la contiene è stato elaborato
+    def predict(self, year, features):
+        request = {'year': year, 'features': features, 'done': threading.Event(), 'result': None, 'error': None}
+        self.requests.put(request)
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['result']
+
+    # Funzione per raccogliere le richieste arrivate entro batch_wait dalla prima
+    def _collect(self):
+        batch = [self.requests.get()]
+        rows = len(batch[0]['features'])
+        deadline = time.perf_counter() + self.batch_wait
+        while rows < self.max_batch_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            rows += len(request['features'])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            for year in {request['year'] for request in batch}:
+                requests = [request for request in batch if request['year'] == year]
+                try:
+                    predictions = self.models.models[year].predict(pd.concat([request['features'] for request in requests]))
+                    bounds = np.cumsum([0] + [len(request['features']) for request in requests])
+                    for request, start, end in zip(requests, bounds[:-1], bounds[1:]):
+                        request['result'] = predictions[start:end]
+                except Exception as e:
+                    for request in requests:
+                        request['error'] = e
+                for request in requests:
+                    request['done'].set()
+
+
+# Funzione per predire l'ordine d'arrivo e i punti di una gara futura a partire dalla griglia di partenza
+def predict_race(models, batcher, grid, year=None):
+    year = models.latest if year is None else int(year)
+    if year not in models.models:
+        raise KeyError(f"Nessun modello per la stagione {year}")
+    driver_ids, features = models.features_for_grid(grid, year)
+    predicted = batcher.predict(year, features)
+    ranks = rank_within_races(np.zeros(len(predicted)), predicted)
+    result = pd.DataFrame({
+        'driverId': driver_ids,
+        'grid': features['grid'].to_numpy(),
+        'predicted_positionOrder': predicted,
+        'predicted_rank': ranks,
+        'predicted_points': points_for_positions(ranks),
+    })
+    return year, result.sort_values(by='predicted_rank')
+
+
+# Funzione per valutare varianti della griglia di una gara con una sola predizione passata dal micro-batch
+def whatif_race(models, batcher, grid, variations, year=None):
+    year = models.latest if year is None else int(year)
+    if year not in models.models:
+        raise KeyError(f"Nessun modello per la stagione {year}")
+    return year, whatif(models, grid, variations, year, predict=lambda features: batcher.predict(year, features))
+
+
+# Funzione per controllare che una griglia sia un oggetto {driverId: posizione} con id interi e posizioni numeriche
+def check_grid(grid, name, drivers=None):
+    if not isinstance(grid, dict):
+        raise ValueError(f"'{name}' deve essere un oggetto {{driverId: posizione}}")
+    for driver_id, position in grid.items():
+        try:
+            int(driver_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}': driverId non valido: {driver_id!r}")
+        if drivers is not None and driver_id not in drivers:
+            raise ValueError(f"'{name}': il pilota {driver_id} non è nella griglia")
+        if isinstance(position, bool) or not isinstance(position, (int, float)) or not np.isfinite(position):
+            raise ValueError(f"'{name}': posizione non valida per il pilota {driver_id}: {position!r}")
+
+
+# Funzione per controllare la forma di una richiesta prima di usarla: griglia non vuota, stagione intera
+# (opzionale) e, per /whatif, lista di varianti con soli piloti della griglia. Solleva ValueError
+def validate_request(path, request):
+    if not isinstance(request, dict):
+        raise ValueError("la richiesta deve essere un oggetto JSON")
+    grid = request.get('grid')
+    check_grid(grid, 'grid')
+    if not grid:
+        raise ValueError("'grid' non può essere vuota")
+    season = request.get('season')
+    if season is not None and (isinstance(season, bool) or not isinstance(season, (int, str)) or not str(season).isdigit()):
+        raise ValueError(f"'season' deve essere un anno intero: {season!r}")
+    if path == '/whatif':
+        variations = request.get('variations')
+        if not isinstance(variations, list):
+            raise ValueError("'variations' deve essere una lista di griglie")
+        for i, variation in enumerate(variations):
+            check_grid(variation, f'variations[{i}]', drivers=grid)
+
+
+# Server HTTP multi-thread con una coda di connessioni abbastanza lunga per i picchi di richieste concorrenti
+class PredictionHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+# Gestore HTTP: POST /predict con {"grid": {"driverId": posizione, ...}, "season": anno (opzionale)} e
+# POST /whatif con in più {"variations": [{"driverId": posizione, ...}, ...]} (solo i piloti che cambiano posizione)
+class PredictionHandler(BaseHTTPRequestHandler):
+    models = None
+    batcher = None
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'seasons': sorted(self.models.models), 'latest': self.models.latest})
+        else:
+            self._send(404, {'error': 'percorso non trovato'})
+
+    def do_POST(self):
+        if self.path not in ('/predict', '/whatif'):
+            self._send(404, {'error': 'percorso non trovato'})
+            return
+        start_time = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            validate_request(self.path, request)
+            if self.path == '/predict':
+                year, result = predict_race(self.models, self.batcher, request['grid'], request.get('season'))
+            else:
+                year, result = whatif_race(self.models, self.batcher, request['grid'], request['variations'], request.get('season'))
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # Qualsiasi altro errore (anche quelli rilanciati dal micro-batch) riceve comunque una risposta
+            self._send(500, {'error': f'errore interno: {type(e).__name__}: {e}'})
+            return
+        self._send(200, {'season': year, 'milliseconds': (time.perf_counter() - start_time) * 1000,
+                         'predictions': result.to_dict(orient='records')})
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Funzione per creare il server con modelli e store già caricati
+def create_server(host=HOST, port=PORT, store_path=FEATURE_STORE_PATH, cache_dir=MODEL_CACHE_DIR):
+    models = PredictionModels(store_path, cache_dir)
+    handler = type('Handler', (PredictionHandler,), {'models': models, 'batcher': MicroBatcher(models)})
+    return PredictionHTTPServer((host, port), handler)
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    server = create_server(port=port)
+    print(f"Server di predizione in ascolto su http://{HOST}:{port} (stagioni: {sorted(server.RequestHandlerClass.models.models)})")
+    server.serve_forever()
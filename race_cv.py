@@ -0,0 +1,64 @@
+import numpy as np
+import shutil
+import tempfile
+from contextlib import contextmanager
+from sklearn.model_selection import BaseCrossValidator
+
+
+# Funzione per ottenere una chiave ordinabile nel tempo per ogni gara (anno e round),
+# da passare come groups allo splitter
+def race_order(data):
+    return (data['year'] * 100 + data['round']).to_numpy()
+
+
+# Splitter per la cross-validation temporale raggruppata per gara: le gare vengono ordinate nel tempo
+# e divise in n_splits + 1 blocchi contigui; ogni fold addestra sui blocchi precedenti e valida sul successivo.
+# Una gara non viene mai divisa tra training e validazione e non si valida mai sul passato
+class RaceTimeSeriesSplit(BaseCrossValidator):
+    def __init__(self, n_splits=5):
+        self.n_splits = n_splits
+
+    def get_n_splits(self, X=None, y=None, groups=None):
+        return self.n_splits
+
+    def split(self, X, y=None, groups=None):
+        if groups is None:
+            raise ValueError("RaceTimeSeriesSplit richiede groups con l'ordine temporale delle gare (vedi race_order)")
+        groups = np.asarray(groups)
+        races = np.unique(groups)
+        if len(races) < self.n_splits + 1:
+            raise ValueError(f"Servono almeno {self.n_splits + 1} gare per {self.n_splits} fold, trovate {len(races)}")
+
+        # Indice del blocco temporale di ogni riga
+        blocks = np.array_split(races, self.n_splits + 1)
+        block_of_race = np.concatenate([np.full(len(block), i) for i, block in enumerate(blocks)])
+        row_block = block_of_race[np.searchsorted(races, groups)]
+
+        for i in range(1, self.n_splits + 1):
+            yield np.flatnonzero(row_block < i), np.flatnonzero(row_block == i)
+
+    def _iter_test_indices(self, X=None, y=None, groups=None):
+        for _, test in self.split(X, y, groups):
+            yield test
+
+
+# Funzione per rimuovere dalla pipeline le trasformazioni che non cambiano i modelli ad albero
+# (la standardizzazione è monotona per ogni feature, quindi gli split restano gli stessi)
+def drop_tree_invariant_steps(pipeline):
+    steps = [(name, step) for name, step in pipeline.steps if name != 'scaler']
+    pipeline.steps = steps
+    return pipeline
+
+
+# Context manager per riutilizzare il preprocessamento tra i punti della griglia: la pipeline salva
+# in una cartella temporanea i trasformatori già addestrati, così imputer e scaler vengono
+# addestrati una sola volta per fold invece che per ogni combinazione di iperparametri
+@contextmanager
+def fold_preprocessing_cache(pipeline):
+    cache_dir = tempfile.mkdtemp(prefix='fold_cache_')
+    pipeline.set_params(memory=cache_dir)
+    try:
+        yield pipeline
+    finally:
+        pipeline.set_params(memory=None)
+        shutil.rmtree(cache_dir, ignore_errors=True)
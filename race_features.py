@@ -0,0 +1,102 @@
+import pandas as pd
+import numpy as np
+
+# Caratteristiche storiche calcolate dal motore, nell'ordine usato dai modelli in try/
+HISTORY_FEATURES = ['last_10_avg_position', 'track_avg_position', 'track_wins', 'track_podiums', 'avg_gained_lost']
+
+# Colonne del dataset lette dal motore delle caratteristiche storiche
+HISTORY_COLUMNS = ['driverId', 'circuitId', 'raceId', 'grid', 'positionOrder']
+
+
+# Funzione per preparare i dati comuni a tutte le caratteristiche storiche: righe ordinate per pilota e gara
+# (l'indice è la posizione della riga nei dati originali) e colonne ausiliarie per le somme cumulative
+def history_frame(data):
+    frame = data[HISTORY_COLUMNS].copy()
+    frame['_row'] = np.arange(len(frame))
+    frame = frame.sort_values(['driverId', 'raceId', '_row'], kind='mergesort')
+    frame.index = frame['_row'].to_numpy()
+
+    # Le righe di una stessa gara di uno stesso pilota non devono vedersi tra loro
+    if frame.duplicated(['driverId', 'raceId']).any():
+        raise ValueError("Il motore richiede al massimo un risultato per pilota per gara")
+
+    position = frame['positionOrder'].astype(float)
+    valid = position.notna()
+    frame['_position'] = position.fillna(0)
+    frame['_valid'] = valid.astype(float)
+    frame['_win'] = (position == 1).astype(float)
+    frame['_podium'] = (position <= 3).astype(float)
+    gained = frame['grid'] - position
+    frame['_gained'] = gained.fillna(0)
+    frame['_gained_valid'] = gained.notna().astype(float)
+    return frame
+
+
+# Media delle ultime 10 gare precedenti del pilota
+def last_10_avg_position(frame):
+    previous = frame.groupby('driverId')['positionOrder'].shift(1)
+    return previous.groupby(frame['driverId']).rolling(10, min_periods=1).mean().reset_index(level=0, drop=True)
+
+
+# Posizione media nelle gare precedenti del pilota sulla stessa pista
+def track_avg_position(frame):
+    track = frame.groupby(['driverId', 'circuitId'])
+    track_sum = track['_position'].cumsum() - frame['_position']
+    track_count = track['_valid'].cumsum() - frame['_valid']
+    return track_sum / track_count.replace(0, np.nan)
+
+
+# Vittorie precedenti del pilota sulla stessa pista
+def track_wins(frame):
+    track = frame.groupby(['driverId', 'circuitId'])
+    return (track['_win'].cumsum() - frame['_win']).astype(np.int64)
+
+
+# Podi precedenti del pilota sulla stessa pista
+def track_podiums(frame):
+    track = frame.groupby(['driverId', 'circuitId'])
+    return (track['_podium'].cumsum() - frame['_podium']).astype(np.int64)
+
+
+# Media delle posizioni guadagnate o perse in tutte le gare precedenti
+def avg_gained_lost(frame):
+    driver = frame.groupby('driverId')
+    gained_sum = driver['_gained'].cumsum() - frame['_gained']
+    gained_count = driver['_gained_valid'].cumsum() - frame['_gained_valid']
+    return gained_sum / gained_count.replace(0, np.nan)
+
+
+# Funzione di calcolo di ogni caratteristica storica, a partire da history_frame
+HISTORY_BUILDERS = {
+    'last_10_avg_position': last_10_avg_position,
+    'track_avg_position': track_avg_position,
+    'track_wins': track_wins,
+    'track_podiums': track_podiums,
+    'avg_gained_lost': avg_gained_lost,
+}
+
+
+# Funzione per calcolare in un solo passaggio le caratteristiche storiche di ogni riga (tutte o solo quelle
+# in features), considerando solo le gare con raceId strettamente minore di quella della riga.
+# I dati vengono ordinati per pilota e gara e le statistiche sono somme cumulative "spostate" di una gara
+def build_history_features(data, features=HISTORY_FEATURES):
+    frame = history_frame(data)
+    result = pd.DataFrame(index=frame.index)
+    for feature in features:
+        result[feature] = HISTORY_BUILDERS[feature](frame)
+
+    # Riporta le righe nell'ordine originale del DataFrame
+    result = result.fillna(0).sort_index()
+    result.index = data.index
+    return result[list(features)]
+
+
+if __name__ == '__main__':
+    import time
+    from data_layer import load_dataset
+
+    # L'equivalenza con la versione riga per riga originale è verificata in tests/test_race_features.py
+    data = load_dataset(columns=HISTORY_COLUMNS)
+    start_time = time.time()
+    build_history_features(data)
+    print(f"Caratteristiche storiche per {len(data)} righe in {time.time() - start_time:.2f} secondi")
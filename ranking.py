@@ -0,0 +1,92 @@
+import numpy as np
+import time
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+
+# Funzione per precalcolare il raggruppamento per gara come intervalli contigui:
+# restituisce l'ordine che rende contigue le righe di ogni gara e gli indici di inizio e fine di ogni gara
+def race_slices(race_ids):
+    race_ids = np.asarray(race_ids)
+    order = np.argsort(race_ids, kind='stable')
+    sorted_ids = race_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    ends = np.r_[starts[1:], len(sorted_ids)]
+    return order, starts, ends
+
+
+# Funzione per trasformare i punteggi (es. posizioni predette dalla regressione) in un ordine d'arrivo
+# intero all'interno di ogni gara, in un solo ordinamento. A parità di punteggio conta l'ordine delle righe,
+# come rank(method='first')
+def rank_within_races(race_ids, scores):
+    race_ids = np.asarray(race_ids)
+    scores = np.asarray(scores, dtype=float)
+    order = np.lexsort((scores, race_ids))
+    sorted_ids = race_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - group_start + 1
+    return ranks
+
+
+# Modello learning-to-rank a coppie: per ogni gara confronta le coppie di piloti e impara,
+# con una regressione logistica sulle differenze delle feature, chi arriva davanti
+class PairwiseRanker:
+    def __init__(self, C=1.0):
+        self.C = C
+
+    # Funzione per costruire le differenze di feature di tutte le coppie di ogni gara
+    def _pairs(self, X, y, race_ids):
+        order, starts, ends = race_slices(race_ids)
+        diffs, labels = [], []
+        for start, end in zip(starts, ends):
+            rows = order[start:end]
+            i, j = np.triu_indices(len(rows), 1)
+            i, j = rows[i], rows[j]
+            keep = y[i] != y[j]
+            diffs.append(X[i[keep]] - X[j[keep]])
+            labels.append(y[i[keep]] < y[j[keep]])
+        diffs = np.concatenate(diffs)
+        labels = np.concatenate(labels)
+        # Ogni coppia viene usata in entrambe le direzioni, così le classi sono bilanciate
+        return np.concatenate([diffs, -diffs]), np.concatenate([labels, ~labels])
+
+    def fit(self, X, y, race_ids):
+        self.scaler_ = StandardScaler().fit(X)
+        X = self.scaler_.transform(X)
+        diffs, labels = self._pairs(X, np.asarray(y), race_ids)
+        self.model_ = LogisticRegression(C=self.C, fit_intercept=False).fit(diffs, labels)
+        return self
+
+    # Punteggio in cui un valore più basso significa arrivare più avanti, come una posizione
+    def predict(self, X):
+        return -self.scaler_.transform(X) @ self.model_.coef_.ravel()
+
+
+# Funzione per confrontare il regressore con il ranker a coppie sulla stessa stagione:
+# tempi di addestramento e predizione, posizioni esatte, entro una posizione ed errore medio
+def compare_rankers(X_train, y_train, train_races, X_test, y_test, test_races, regressor_pred):
+    X_train = np.asarray(X_train, dtype=float)
+    X_test = np.asarray(X_test, dtype=float)
+    y_test = np.asarray(y_test)
+
+    start_time = time.perf_counter()
+    ranker = PairwiseRanker().fit(X_train, np.asarray(y_train), np.asarray(train_races))
+    fit_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    ranker_scores = ranker.predict(X_test)
+    predict_seconds = time.perf_counter() - start_time
+
+    results = {}
+    for name, scores in [('regressor', regressor_pred), ('ranker', ranker_scores)]:
+        ranks = rank_within_races(test_races, scores)
+        results[name] = {
+            'exact': np.mean(ranks == y_test),
+            'within_one': np.mean(np.abs(ranks - y_test) <= 1),
+            'mae': np.mean(np.abs(ranks - y_test)),
+        }
+    results['ranker'].update({'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds})
+    return rank_within_races(test_races, ranker_scores), results
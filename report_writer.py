@@ -0,0 +1,196 @@
+import pandas as pd
+import numpy as np
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import stage
+from ranking import race_slices, rank_within_races
+from scoring import points_for_positions
+
+# Colonne che identificano piloti e scuderie nelle classifiche (stesso ordinamento del vecchio report)
+DRIVER_KEYS = ['year', 'driverId', 'driverForename', 'driverSurname', 'constructorName']
+CONSTRUCTOR_KEYS = ['year', 'constructorId', 'constructorName']
+
+# Numero di piloti mostrati per ogni gara
+TOP_N = 10
+
+# Cartella con classifiche e sezioni HTML già calcolate per ogni stagione. La chiave di ogni stagione
+# è l'hash delle sue righe di predizione e della versione del renderer: cambiando le predizioni
+# di una sola stagione viene ricalcolata solo quella
+REPORT_CACHE_DIR = 'report_cache'
+REPORT_VERSION = 1
+
+# Numero di processi predefinito per il rendering delle stagioni
+N_WORKERS = os.cpu_count() or 1
+
+
+# Funzione per aggiungere ordine d'arrivo predetto e punti predetti e reali ad ogni riga
+def add_points(data):
+    # Ordine predetto per gara: quello calcolato dalla fase di predizione, se presente nel file
+    if 'predicted_rank' in data.columns:
+        data['predicted_final_position'] = data['predicted_rank'].astype(float)
+    else:
+        data['predicted_final_position'] = rank_within_races(data['raceId'].to_numpy(), data['predicted_positionOrder'].to_numpy()).astype(float)
+    data['predicted_points'] = points_for_positions(data['predicted_final_position'])
+    data['real_points'] = points_for_positions(data['positionOrder'])
+    return data
+
+
+# Funzione per calcolare una classifica di una stagione già unita ai punti reali: le righe sono ordinate
+# per punti predetti, e per ogni riga i punti reali sono quelli della prima riga con la stessa chiave
+# nella classifica reale (come il vecchio lookup .loc[...].values[0] riga per riga)
+def season_standings(season, keys, id_col):
+    totals = season.groupby(keys, observed=True)[['predicted_points', 'real_points']].sum().reset_index()
+    predicted = totals.sort_values(by=['year', 'predicted_points'], ascending=[True, False])
+    real = totals.sort_values(by=['year', 'real_points'], ascending=[True, False])
+    real = real.drop_duplicates(id_col).set_index(id_col)['real_points']
+    predicted['real_points'] = predicted[id_col].map(real).to_numpy()
+    return predicted
+
+
+# Funzione per scrivere una tabella HTML a partire da colonne già estratte come array
+def write_table(out, headers, columns):
+    out.write("<table border='1'><tr>" + ''.join(f'<th>{header}</th>' for header in headers) + '</tr>')
+    out.write(''.join('<tr>' + ''.join(f'<td>{value}</td>' for value in row) + '</tr>' for row in zip(*columns)))
+    out.write('</table>')
+
+
+# Funzione per scrivere le classifiche finali (predetta vs reale) di una stagione
+def write_standings(out, year, drivers, constructors):
+    out.write(f"<h1>Classifica finale per l'anno {year} (Predetta vs Reale)</h1>")
+    out.write('<h2>Classifica Piloti</h2>')
+    names = [f'{forename} {surname}' for forename, surname in zip(drivers['driverForename'].to_numpy(), drivers['driverSurname'].to_numpy())]
+    write_table(out, ['Posizione', 'Pilota', 'Scuderia', 'Punti Predetti', 'Punti Reali'], [
+        range(1, len(drivers) + 1), names, drivers['constructorName'].to_numpy(),
+        drivers['predicted_points'].to_numpy(), drivers['real_points'].to_numpy()])
+    out.write('<br>')
+
+    out.write('<h2>Classifica Costruttori</h2>')
+    write_table(out, ['Posizione', 'Costruttore', 'Punti Predetti', 'Punti Reali'], [
+        range(1, len(constructors) + 1), constructors['constructorName'].to_numpy(),
+        constructors['predicted_points'].to_numpy(), constructors['real_points'].to_numpy()])
+    out.write('<br>')
+
+
+# Funzione per scrivere, gara per gara, i primi piloti con le differenze tra posizione predetta e reale.
+# Le righe di ogni gara sono un intervallo contiguo degli array della stagione
+def write_races(out, season):
+    race_names = season['raceName'].to_numpy()
+    years = season['year'].to_numpy()
+    forenames = season['driverForename'].to_numpy()
+    surnames = season['driverSurname'].to_numpy()
+    predicted = season['predicted_final_position'].to_numpy()
+    real = season['positionOrder'].to_numpy()
+    status = season['raceStatus'].to_numpy()
+
+    order, starts, ends = race_slices(season['raceId'].to_numpy())
+    for start, end in zip(starts, ends):
+        rows = order[start:end]
+        top = rows[:TOP_N]
+        out.write(f'<h2>{race_names[rows[0]]} ({years[rows[0]]})</h2>')
+        names = [f'{forename} {surname}' for forename, surname in zip(forenames[top], surnames[top])]
+        write_table(out, ['Pilota', 'Posizione predetta', 'Posizione reale', 'Race Status', 'Diff'], [
+            names, predicted[top], real[top], status[top], real[top] - predicted[top]])
+
+        out.write(f'<p>Posizioni azzeccate: {np.sum(real[rows] == predicted[rows])}/10</p>')
+        finished = rows[status[rows] == 'Finished']
+        avg_diff = np.mean(real[finished] - predicted[finished]) if len(finished) else np.nan
+        out.write(f'<p>Media differenza (Finished): {avg_diff:.2f}</p>')
+        out.write('<br>')
+
+
+# Funzione per calcolare la chiave di cache di una stagione
+def season_key(season):
+    digest = hashlib.sha256(f'v{REPORT_VERSION}'.encode())
+    digest.update(','.join(season.columns).encode())
+    digest.update(pd.util.hash_pandas_object(season, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+# Funzione per ottenere il percorso di un file di cache di una stagione
+def cache_path(year, key, suffix, cache_dir=REPORT_CACHE_DIR):
+    return os.path.join(cache_dir, f'{year}-{key}.{suffix}')
+
+
+# Funzione per scrivere un file di cache in modo atomico e rimuovere le versioni precedenti della stagione
+def _replace_cached(path, write, year, suffix, cache_dir):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+    for old_path in glob.glob(os.path.join(cache_dir, f'{year}-*.{suffix}')):
+        if old_path != path:
+            os.remove(old_path)
+
+
+# Funzione per ottenere le classifiche piloti e costruttori di una stagione, calcolate una sola volta
+# e poi rilette dalla cache finché le predizioni della stagione non cambiano
+def cached_standings(year, season, key, cache_dir=REPORT_CACHE_DIR):
+    path = cache_path(year, key, 'pkl', cache_dir)
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+    standings = (season_standings(season, DRIVER_KEYS, 'driverId'), season_standings(season, CONSTRUCTOR_KEYS, 'constructorId'))
+    os.makedirs(cache_dir, exist_ok=True)
+    _replace_cached(path, lambda tmp_path: pd.to_pickle(standings, tmp_path), year, 'pkl', cache_dir)
+    return standings
+
+
+# Funzione per scrivere la sezione completa di una stagione
+def write_season(out, year, season, standings=None):
+    if standings is None:
+        standings = (season_standings(season, DRIVER_KEYS, 'driverId'), season_standings(season, CONSTRUCTOR_KEYS, 'constructorId'))
+    write_standings(out, year, *standings)
+    write_races(out, season)
+
+
+# Funzione per produrre la sezione HTML di una stagione nella cache (eseguita in un processo separato).
+# Restituisce il percorso della sezione
+def render_season(year, season, key, cache_dir=REPORT_CACHE_DIR):
+    path = cache_path(year, key, 'html', cache_dir)
+    standings = cached_standings(year, season, key, cache_dir)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as out:
+            write_season(out, year, season, standings)
+    _replace_cached(path, write, year, 'html', cache_dir)
+    return path
+
+
+# Funzione per scrivere il report HTML: le stagioni già in cache vengono riusate, le altre vengono
+# generate in parallelo su più processi, e le sezioni vengono poi copiate in ordine nel file finale,
+# senza mai tenere l'intero documento in memoria
+def write_report(data, output_html, n_workers=N_WORKERS, cache_dir=REPORT_CACHE_DIR):
+    with stage('report', rows=len(data)):
+        _write_report(data, output_html, n_workers, cache_dir)
+
+
+def _write_report(data, output_html, n_workers, cache_dir):
+    data = add_points(data)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    sections = {}
+    pending = []
+    for year, season in data.groupby('year', sort=True):
+        key = season_key(season)
+        sections[year] = cache_path(year, key, 'html', cache_dir)
+        if not os.path.exists(sections[year]):
+            pending.append((year, season, key))
+
+    n_workers = max(1, min(n_workers, len(pending)))
+    if n_workers == 1:
+        for year, season, key in pending:
+            render_season(year, season, key, cache_dir)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(render_season, year, season, key, cache_dir) for year, season, key in pending]
+            for future in futures:
+                future.result()
+    print(f"Stagioni generate: {len(pending)}, riusate dalla cache: {len(sections) - len(pending)}")
+
+    with open(output_html, 'w') as out:
+        out.write('<html><head><title>Analisi delle Predizioni</title></head><body>')
+        for year in sorted(sections):
+            with open(sections[year]) as section:
+                for chunk in iter(lambda: section.read(1 << 20), ''):
+                    out.write(chunk)
+        out.write('</body></html>')
@@ -0,0 +1,69 @@
+import numpy as np
+from ranking import rank_within_races
+
+# Punti assegnati dalla prima posizione in poi per ogni sistema di punteggio
+POINTS_SYSTEMS = {
+    '2010': [25, 18, 15, 12, 10, 8, 6, 4, 2, 1],
+    '2003': [10, 8, 6, 5, 4, 3, 2, 1],
+    '1991': [10, 6, 4, 3, 2, 1],
+    '1961': [9, 6, 4, 3, 2, 1],
+    '1960': [8, 6, 4, 3, 2, 1],
+    '1950': [8, 6, 4, 3, 2],
+    'sprint_2022': [8, 7, 6, 5, 4, 3, 2, 1],
+    'sprint_2021': [3, 2, 1],
+}
+
+# Sistemi usati di default per i Gran Premi e per le gare sprint
+DEFAULT_SYSTEM = '2010'
+DEFAULT_SPRINT_SYSTEM = 'sprint_2022'
+
+# Punto per il giro più veloce (2019-2024), assegnato solo a chi arriva entro la decima posizione
+FASTEST_LAP_POINTS = 1
+FASTEST_LAP_MAX_POSITION = 10
+
+
+# Funzione per ottenere la tabella di lookup: l'elemento i contiene i punti della posizione i (0 = nessun punto)
+def points_table(system=DEFAULT_SYSTEM):
+    return np.array([0] + POINTS_SYSTEMS[system], dtype=np.int64)
+
+
+# Funzione per convertire intere colonne di posizioni in punti con un lookup sull'array della tabella.
+# Le posizioni non intere, non valide o fuori dalla zona punti valgono 0, come nella vecchia catena if/elif.
+# fastest_lap, sprint e half_points possono essere booleani o array della stessa lunghezza delle posizioni
+def points_for_positions(positions, system=DEFAULT_SYSTEM, fastest_lap=None, sprint=None, half_points=None,
+                         sprint_system=DEFAULT_SPRINT_SYSTEM):
+    positions = np.asarray(positions, dtype=float)
+    valid = np.isfinite(positions) & (positions == np.round(positions)) & (positions >= 1)
+
+    # Indice nella tabella: 0 per tutte le posizioni senza punti
+    table = points_table(system)
+    index = np.where(valid & (positions < len(table)), positions, 0).astype(np.int64)
+    points = table[index]
+
+    if sprint is not None:
+        sprint_table = points_table(sprint_system)
+        sprint_index = np.where(valid & (positions < len(sprint_table)), positions, 0).astype(np.int64)
+        points = np.where(sprint, sprint_table[sprint_index], points)
+
+    if fastest_lap is not None:
+        eligible = np.asarray(fastest_lap, dtype=bool) & valid & (positions <= FASTEST_LAP_MAX_POSITION)
+        if sprint is not None:
+            eligible &= ~np.asarray(sprint, dtype=bool)
+        points = points + FASTEST_LAP_POINTS * eligible
+
+    if half_points is not None:
+        points = np.where(half_points, points / 2, points)
+
+    return points
+
+
+# Funzione per trasformare le posizioni predette (anche frazionarie, es. 3.4) in un ordine d'arrivo
+# all'interno di ogni gara e assegnare i punti di quell'ordine
+def predicted_points(data, score_col='predicted_positionOrder', race_col='raceId', **kwargs):
+    ranks = rank_within_races(data[race_col].to_numpy(), data[score_col].to_numpy())
+    return points_for_positions(ranks, **kwargs)
+
+
+# Calcolo dei punti per una singola posizione, compatibile con la vecchia funzione calculate_points
+def calculate_points(position):
+    return int(points_for_positions([position])[0])
@@ -0,0 +1,68 @@
+import pandas as pd
+import os
+import shutil
+from data_layer import append_rows, known_race_ids, load_dataset
+from feature_store import SNAPSHOT_VERSION, FeatureStore
+from join_engine import FINAL_COLUMNS, build_final_data, read_table
+
+# Dataset storico di partenza e dataset aggiornato con le nuove gare
+BASE_PATH = 'final_data_sorted.csv'
+TARGET_PATH = 'final_data_2024.csv'
+
+# Suffisso dei CSV Ergast aggiornati (circuits24.csv, results24.csv, ...)
+SOURCE_SUFFIX = '24'
+
+# Store delle caratteristiche del dataset aggiornato (separato da quello del dataset storico)
+TARGET_FEATURE_STORE_PATH = 'feature_store_2024.npz'
+
+# Colonne da completare con l'ultimo valore noto del pilota
+FFILL_COLUMNS = ['grid', 'positionOrder', 'resultPoints', 'laps']
+
+
+# Funzione per trovare le gare con risultati nei CSV aggiornati che non sono ancora nel dataset
+def find_new_races(known_race_ids, source_dir='.', suffix=SOURCE_SUFFIX, min_year=2013):
+    races = read_table(source_dir, 'races', suffix)
+    results = read_table(source_dir, 'results', suffix)
+    candidates = races.loc[races['year'] >= min_year, 'raceId']
+    with_results = candidates[candidates.isin(results['raceId'])]
+    return sorted(set(with_results) - set(known_race_ids))
+
+
+# Funzione per aggiornare lo store delle caratteristiche con le sole righe nuove
+def update_target_features(new_rows, dataset_path, store_path=TARGET_FEATURE_STORE_PATH):
+    store = FeatureStore.load(store_path) if os.path.exists(store_path) else None
+    if store is None or store.version != SNAPSHOT_VERSION:
+        # Primo avvio (o snapshot di una versione precedente): lo store parte dalle righe già presenti nel dataset
+        store = FeatureStore()
+        store.update_frame(load_dataset(columns=['resultId', 'driverId', 'grid', 'positionOrder'], csv_path=dataset_path))
+    store.update_frame(new_rows)
+    store.save(store_path)
+    return store
+
+
+# Funzione per aggiungere al dataset solo le gare nuove: le unioni vengono fatte solo sulle loro righe,
+# che vengono poi accodate al CSV e alla partizione della loro stagione, e le caratteristiche per pilota
+# vengono aggiornate in modo incrementale. Il costo dipende dal numero di gare nuove, non dallo storico
+def append_new_races(source_dir='.', base_path=BASE_PATH, target_path=TARGET_PATH, suffix=SOURCE_SUFFIX,
+                     store_path=TARGET_FEATURE_STORE_PATH, rebuild=False):
+    if rebuild or not os.path.exists(target_path):
+        shutil.copyfile(base_path, target_path)
+        if os.path.exists(store_path):
+            os.remove(store_path)
+
+    new_race_ids = find_new_races(known_race_ids(target_path), source_dir, suffix)
+    if not new_race_ids:
+        print('Nessuna nuova gara da aggiungere.')
+        return pd.DataFrame(columns=FINAL_COLUMNS)
+
+    new_rows, steps = build_final_data(source_dir, race_ids=new_race_ids, suffix=suffix)
+    print(steps.to_string(index=False))
+
+    # Riempi i valori mancanti con l'ultimo valore disponibile per lo stesso pilota
+    new_rows[FFILL_COLUMNS] = new_rows.groupby('driverId')[FFILL_COLUMNS].ffill()
+
+    update_target_features(new_rows, target_path, store_path)
+    append_rows(new_rows, target_path)
+
+    print(f"Aggiunte {len(new_race_ids)} gare ({len(new_rows)} righe) a '{target_path}'.")
+    return new_rows
@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from scoring import DEFAULT_SYSTEM, points_table
+
+# Numero di stagioni simulate e dimensione dei blocchi elaborati in memoria
+N_SIMULATIONS = 100_000
+CHUNK_SIZE = 5_000
+
+# Numero di processi predefinito per la simulazione
+N_WORKERS = os.cpu_count() or 1
+
+# Colonna con la dispersione delle predizioni tra gli alberi della foresta
+STD_COLUMN = 'predicted_positionStd'
+
+
+# Funzione per calcolare la dispersione delle predizioni tra gli alberi di una foresta (in pipeline).
+# Restituisce None per i modelli che non sono un insieme di alberi
+def prediction_spread(model, X):
+    estimator = model[-1] if hasattr(model, 'steps') else model
+    if not hasattr(estimator, 'estimators_'):
+        return None
+    Xt = model[:-1].transform(X) if hasattr(model, 'steps') else X
+    Xt = np.asarray(Xt, dtype=np.float32)
+    per_tree = np.stack([np.ravel(tree.predict(Xt)) for tree in np.ravel(estimator.estimators_)])
+    return per_tree.std(axis=0)
+
+
+# Funzione per trasformare le predizioni di una stagione in matrici (gare x piloti):
+# media e deviazione standard della posizione predetta, presenza del pilota e scuderia per gara
+def season_arrays(season):
+    race_ids = np.sort(season['raceId'].unique())
+    driver_ids = np.sort(season['driverId'].unique())
+    constructor_ids = np.sort(season['constructorId'].unique())
+    race_index = np.searchsorted(race_ids, season['raceId'].to_numpy())
+    driver_index = np.searchsorted(driver_ids, season['driverId'].to_numpy())
+
+    shape = (len(race_ids), len(driver_ids))
+    mean = np.zeros(shape)
+    std = np.zeros(shape)
+    present = np.zeros(shape, dtype=bool)
+    constructor = np.zeros(shape, dtype=np.int64)
+
+    if STD_COLUMN in season.columns:
+        spread = season[STD_COLUMN].to_numpy(dtype=float)
+    else:
+        # Senza la dispersione per albero si usa l'errore medio della stagione
+        residuals = season['positionOrder'] - season['predicted_positionOrder']
+        spread = np.full(len(season), residuals.std())
+
+    mean[race_index, driver_index] = season['predicted_positionOrder'].to_numpy(dtype=float)
+    std[race_index, driver_index] = spread
+    present[race_index, driver_index] = True
+    constructor[race_index, driver_index] = np.searchsorted(constructor_ids, season['constructorId'].to_numpy())
+    return race_ids, driver_ids, constructor_ids, mean, std, present, constructor
+
+
+# Funzione per simulare un blocco di stagioni in modo vettorizzato su array (simulazioni x gare x piloti).
+# Ogni posizione predetta viene campionata da una normale con la dispersione degli alberi, l'ordine d'arrivo
+# di ogni gara è l'ordinamento dei campioni, e i punti vengono sommati per pilota e per scuderia.
+# Restituisce, per piloti e scuderie, quante volte hanno vinto il titolo, chiuso sul podio e i punti totali
+def simulate_chunk(mean, std, present, constructor, n_constructors, n_sims, seed, system=DEFAULT_SYSTEM):
+    rng = np.random.default_rng(seed)
+    n_races, n_drivers = mean.shape
+
+    samples = mean + std * rng.standard_normal((n_sims, n_races, n_drivers), dtype=np.float32)
+    samples[:, ~present] = np.inf
+
+    # Posizione d'arrivo di ogni pilota in ogni gara simulata
+    order = np.argsort(samples, axis=2)
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(1, n_drivers + 1), axis=2)
+
+    # Le posizioni oltre la zona punti valgono 0
+    table = points_table(system)
+    points = np.where(positions < len(table), table[np.minimum(positions, len(table) - 1)], 0) * present
+
+    driver_totals = points.sum(axis=1)
+    constructor_onehot = np.zeros((n_races, n_drivers, n_constructors))
+    constructor_onehot[np.arange(n_races)[:, None], np.arange(n_drivers)[None, :], constructor] = present
+    constructor_totals = np.einsum('srd,rdc->sc', points, constructor_onehot)
+
+    return _standings_counts(driver_totals), _standings_counts(constructor_totals)
+
+
+# Funzione per contare titoli e podi di campionato a partire dai punti totali di ogni simulazione
+def _standings_counts(totals):
+    ranking = np.argsort(-totals, axis=1, kind='stable')
+    n = totals.shape[1]
+    titles = np.bincount(ranking[:, 0], minlength=n)
+    podiums = np.bincount(ranking[:, :3].ravel(), minlength=n)
+    return titles, podiums, totals.sum(axis=0)
+
+
+# Funzione per eseguire un blocco in un processo separato
+def _simulate_chunk_job(args):
+    return simulate_chunk(*args)
+
+
+# Funzione per simulare n_sims stagioni a blocchi di chunk_size (memoria limitata) su più processi.
+# Restituisce due DataFrame con probabilità di titolo e di podio e punti medi per piloti e scuderie
+def simulate_season(season, n_sims=N_SIMULATIONS, chunk_size=CHUNK_SIZE, n_workers=N_WORKERS, seed=0,
+                    system=DEFAULT_SYSTEM):
+    race_ids, driver_ids, constructor_ids, mean, std, present, constructor = season_arrays(season)
+    mean = mean.astype(np.float32)
+    std = std.astype(np.float32)
+
+    sizes = [min(chunk_size, n_sims - start) for start in range(0, n_sims, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(mean, std, present, constructor, len(constructor_ids), size, chunk_seed, system)
+            for size, chunk_seed in zip(sizes, seeds)]
+
+    if n_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_simulate_chunk_job, jobs))
+    else:
+        results = [_simulate_chunk_job(job) for job in jobs]
+
+    drivers = _summary(driver_ids, 'driverId', [result[0] for result in results], n_sims)
+    constructors = _summary(constructor_ids, 'constructorId', [result[1] for result in results], n_sims)
+    return drivers, constructors
+
+
+# Funzione per sommare i conteggi dei blocchi e trasformarli in probabilità
+def _summary(ids, id_col, counts, n_sims):
+    titles = sum(count[0] for count in counts)
+    podiums = sum(count[1] for count in counts)
+    points = sum(count[2] for count in counts)
+    summary = pd.DataFrame({
+        id_col: ids,
+        'title_probability': titles / n_sims,
+        'podium_probability': podiums / n_sims,
+        'mean_points': points / n_sims,
+    })
+    return summary.sort_values(by=['title_probability', 'mean_points'], ascending=False).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    from data_layer import load_predictions
+
+    columns = ['raceId', 'year', 'driverId', 'driverForename', 'driverSurname', 'constructorId', 'constructorName',
+               'positionOrder', 'predicted_positionOrder']
+    data = load_predictions('predicted_results6.csv')
+    data = data[[col for col in columns + [STD_COLUMN] if col in data.columns]]
+
+    driver_names = data[['driverId', 'driverForename', 'driverSurname']].drop_duplicates('driverId')
+    constructor_names = data[['constructorId', 'constructorName']].drop_duplicates('constructorId')
+
+    results = []
+    for year, season in data.groupby('year'):
+        start_time = time.time()
+        drivers, constructors = simulate_season(season)
+        print(f"Anno {year}: {N_SIMULATIONS} stagioni simulate in {time.time() - start_time:.2f} secondi")
+
+        drivers = drivers.merge(driver_names, on='driverId', how='left')
+        constructors = constructors.merge(constructor_names, on='constructorId', how='left')
+        print(drivers.head(5).to_string(index=False))
+        print(constructors.head(3).to_string(index=False))
+
+        results.append(drivers.assign(year=year, type='driver'))
+        results.append(constructors.assign(year=year, type='constructor'))
+
+    pd.concat(results).to_csv('season_simulation.csv', index=False)
+    print("Le probabilità simulate sono state salvate in 'season_simulation.csv'.")
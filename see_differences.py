@@ -1,11 +1,19 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from IPython.display import HTML
+from data_layer import load_predictions
 
 # Carica il file CSV con i risultati delle predizioni
 file_path = 'predicted_results2.csv'
-data = pd.read_csv(file_path)
+
+# Metriche confrontate tra valore predetto e reale
+compared_columns = [
+    'constructorPoints', 'constructorPosition', 'constructorWins', 
+    'driverPoints', 'driverPosition', 'driverWins', 
+    'grid', 'positionOrder', 'resultPoints', 'laps']
+
+# Leggi solo le colonne necessarie per il confronto
+data = load_predictions(file_path, columns=['year', 'raceName', 'driverSurname', 'constructorName'] + compared_columns + [f'predicted_{col}' for col in compared_columns])
 
 # Funzione per filtrare i dati per anno e gara
 def filter_data_by_year_and_race(data, year, race_name):
@@ -25,10 +33,7 @@ def visualize_predictions_table(year, race_name):
         return
     
     # Calcola le differenze per le metriche richieste
-    for col in [
-        'constructorPoints', 'constructorPosition', 'constructorWins', 
-        'driverPoints', 'driverPosition', 'driverWins', 
-        'grid', 'positionOrder', 'resultPoints', 'laps']:
+    for col in compared_columns:
         filtered_data.loc[:, f'diff_{col}'] = filtered_data[f'predicted_{col}'] - filtered_data[col]
     
     # Seleziona le colonne da visualizzare per i piloti
@@ -1,9 +1,14 @@
 import pandas as pd
+from data_layer import load_predictions
+from ranking import rank_within_races
 
-data = pd.read_csv('predicted_results6.csv')
+data = load_predictions('predicted_results6.csv', columns=['raceId', 'year', 'positionOrder', 'predicted_positionOrder'],
+                        optional=['predicted_rank'])
 
+# L'ordine per gara viene ricalcolato solo se il file delle predizioni non lo contiene già
 def convert_to_ordinal(data):
-    data['predicted_rank'] = data.groupby('raceId')['predicted_positionOrder'].rank(method='first').astype(int)
+    if 'predicted_rank' not in data.columns:
+        data['predicted_rank'] = rank_within_races(data['raceId'].to_numpy(), data['predicted_positionOrder'].to_numpy())
     return data
 
 def calculate_accuracy(data):
@@ -0,0 +1,27 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Rende importabili i moduli nella cartella principale del progetto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Piccolo storico sintetico in ordine di gara: piste che si ripetono, piloti che saltano gare
+# e posizioni e griglie mancanti, per le caratteristiche storiche e le medie mobili per pilota
+@pytest.fixture
+def race_results():
+    rng = np.random.default_rng(1)
+    rows = []
+    for race in range(1, 31):
+        drivers = rng.permutation(8)[:int(rng.integers(5, 9))]
+        for position, driver in enumerate(drivers, start=1):
+            rows.append({'raceId': race, 'resultId': race * 100 + driver, 'driverId': driver,
+                         'circuitId': race % 4, 'year': 2000 + race // 10,
+                         'grid': int(rng.integers(1, 9)), 'positionOrder': float(position),
+                         'resultPoints': float(max(0, 10 - position))})
+    data = pd.DataFrame(rows)
+    data.loc[rng.random(len(data)) < 0.1, 'positionOrder'] = np.nan
+    data.loc[rng.random(len(data)) < 0.05, 'grid'] = np.nan
+    return data
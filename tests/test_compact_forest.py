@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from compact_forest import CompactForest, export_model
+
+FEATURES = ['grid', 'previous_position', 'avg_last_10_positions', 'avg_positions_gained']
+
+
+# Piccola pipeline imputazione (+ standardizzazione) + foresta su feature con scale diverse e valori mancanti
+def small_pipeline(scaled):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal([10, 10, 10, 0], [6, 6, 3, 2], size=(300, 4)).round(1), columns=FEATURES)
+    X[X.abs() > 20] = np.nan
+    y = rng.integers(1, 21, size=len(X)).astype(float)
+    steps = [('imputer', SimpleImputer(strategy='mean'))]
+    if scaled:
+        steps.append(('scaler', StandardScaler()))
+    steps.append(('model', RandomForestRegressor(n_estimators=8, max_depth=6, random_state=0)))
+    return Pipeline(steps).fit(X, y), X
+
+
+# Soglie di tutti i nodi nello spazio originale delle feature (prima della standardizzazione)
+def split_points(model):
+    features, values = [], []
+    for estimator in model['model'].estimators_:
+        split = estimator.tree_.feature >= 0
+        feature = estimator.tree_.feature[split]
+        threshold = estimator.tree_.threshold[split]
+        if 'scaler' in model.named_steps:
+            threshold = threshold * model['scaler'].scale_[feature] + model['scaler'].mean_[feature]
+        features.append(feature)
+        values.append(threshold)
+    return np.concatenate(features), np.concatenate(values)
+
+
+# Righe con la feature di un nodo posta esattamente su un valore e sui float64 immediatamente sotto e sopra,
+# e sul float32 più vicino
+def rows_around(base, features, values):
+    rows = []
+    for feature, value in zip(features, values):
+        for candidate in (np.nextafter(value, -np.inf), value, np.nextafter(value, np.inf), np.float32(value)):
+            row = base.copy()
+            row[feature] = candidate
+            rows.append(row)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize('scaled', [True, False])
+def test_compact_forest_matches_sklearn_bit_for_bit(tmp_path, scaled):
+    model, X = small_pipeline(scaled)
+    meta = export_model(model, str(tmp_path / 'model'))
+    assert meta['folded'] == scaled and meta['imputed']
+    compact = CompactForest.load(str(tmp_path / 'model'))
+
+    # Attorno alle soglie originali e a quelle salvate (piegate se c'è lo scaler), più righe del training
+    # con valori mancanti
+    base = X.fillna(0).to_numpy()[0]
+    saved = np.asarray(compact.feature) >= 0
+    X_test = pd.DataFrame(np.vstack([
+        rows_around(base, *split_points(model)),
+        rows_around(base, np.asarray(compact.feature)[saved], np.asarray(compact.threshold)[saved]),
+        X.to_numpy()[:100],
+    ]), columns=FEATURES)
+    assert X_test.isna().to_numpy().any()
+
+    assert np.array_equal(compact.predict(X_test), model.predict(X_test))
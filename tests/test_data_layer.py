@@ -0,0 +1,55 @@
+import pandas as pd
+from data_layer import append_rows, apply_types, known_race_ids, load_dataset, load_window, \
+    materialize, materialize_partitions
+
+
+# Piccolo dataset con due stagioni, nello stesso formato di final_data_sorted.csv
+def write_dataset(path):
+    data = pd.DataFrame({
+        'raceId': [1, 1, 2, 2],
+        'year': [2022, 2022, 2023, 2023],
+        'raceName': ['Bahrain Grand Prix', 'Bahrain Grand Prix', 'Monaco Grand Prix', 'Monaco Grand Prix'],
+        'date': ['2022-03-20', '2022-03-20', '2023-05-28', '2023-05-28'],
+        'resultId': [10, 11, 12, 13],
+        'driverId': [1, 2, 1, 2],
+        'grid': [1, 2, 2, 1],
+        'positionOrder': [1, 2, 2, 1],
+    })
+    data.to_csv(path, index=False)
+    return data
+
+
+# Dopo l'aggiunta di nuove gare, le gare note e il file colonnare completo sono aggiornati
+# senza rileggere il CSV per intero
+def test_append_rows_updates_store_without_reparsing_csv(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'dataset.csv')
+    data = write_dataset(csv_path)
+    materialize(csv_path)
+    materialize_partitions(csv_path)
+
+    new_rows = pd.DataFrame({
+        'raceId': [3, 3, 4], 'year': [2023, 2023, 2024],
+        'raceName': ['Italian Grand Prix', 'Italian Grand Prix', 'Bahrain Grand Prix'],
+        'date': ['2023-09-03', '2023-09-03', '2024-03-02'],
+        'resultId': [14, 15, 16], 'driverId': [1, 2, 1], 'grid': [1, 2, 1], 'positionOrder': [2, 1, 1],
+    })
+
+    full_reads = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        if kwargs.get('nrows') != 0:
+            full_reads.append(args)
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_csv', counting_read_csv)
+    append_rows(new_rows, csv_path)
+    assert sorted(known_race_ids(csv_path)) == [1, 2, 3, 4]
+    stored = load_dataset(csv_path=csv_path)
+    window = load_window(2023, 2024, csv_path=csv_path)
+    assert full_reads == []
+
+    monkeypatch.setattr(pd, 'read_csv', read_csv)
+    expected = apply_types(pd.concat([data, new_rows], ignore_index=True))
+    pd.testing.assert_frame_equal(stored, expected, check_categorical=False)
+    assert window['raceId'].tolist() == [2, 2, 3, 3, 4]
@@ -0,0 +1,38 @@
+import json
+import numpy as np
+import feature_cache
+from feature_cache import entry_paths, feature_frame, feature_matrix
+from race_features import build_history_features, last_10_avg_position
+
+
+# Funzione per leggere le feature ricalcolate nell'ultima scrittura di una voce
+def recomputed(cache_dir, feature_set):
+    with open(entry_paths(feature_set, 2020, 'train', cache_dir)[1]) as f:
+        return json.load(f)['recomputed']
+
+
+def test_matrix_matches_direct_computation(race_results, tmp_path):
+    frame = feature_frame(race_results, 'history', 2020, cache_dir=str(tmp_path))
+    history = build_history_features(race_results)
+    np.testing.assert_array_equal(frame[history.columns].to_numpy(), history.to_numpy(dtype=np.float32))
+    assert feature_matrix(race_results, 'history', 2020, cache_dir=str(tmp_path)).dtype == np.float32
+
+
+# Modificare una sola caratteristica storica ricalcola solo quella colonna, e solo negli insiemi che la usano
+def test_changing_one_feature_invalidates_only_its_column(race_results, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    feature_matrix(race_results, 'history', 2020, cache_dir=cache_dir)
+    feature_matrix(race_results, 'track', 2020, cache_dir=cache_dir)
+    assert recomputed(cache_dir, 'track') == []
+    track_meta_path = entry_paths('track', 2020, 'train', cache_dir)[1]
+    with open(track_meta_path) as f:
+        track_meta = f.read()
+
+    monkeypatch.setitem(feature_cache._code_versions, last_10_avg_position, 'modificata')
+    feature_matrix(race_results, 'history', 2020, cache_dir=cache_dir)
+    assert recomputed(cache_dir, 'history') == ['last_10_avg_position']
+
+    # La voce di 'track' è ancora valida e non viene riscritta
+    feature_matrix(race_results, 'track', 2020, cache_dir=cache_dir)
+    with open(track_meta_path) as f:
+        assert f.read() == track_meta
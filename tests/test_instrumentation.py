@@ -0,0 +1,45 @@
+import json
+import os
+import numpy as np
+import pytest
+from instrumentation import PROC_CLEAR_REFS_PATH, current_rss_mb, load_run_log, stage, summarize_run
+
+# Il picco di ogni fase si misura solo dove il picco di /proc si può azzerare (Linux)
+PEAK_RESET = current_rss_mb() is not None and os.access(PROC_CLEAR_REFS_PATH, os.W_OK)
+
+
+@pytest.mark.skipif(not PEAK_RESET, reason='picco di /proc non azzerabile')
+def test_stage_records_process_peak_and_own_increase(tmp_path):
+    log_path = str(tmp_path / 'run_log.jsonl')
+    before = current_rss_mb()
+    with stage('outer', log_path=log_path):
+        with stage('heavy', log_path=log_path):
+            block = np.ones(64 * 1024 ** 2 // 8)
+            block.sum()
+        del block
+        with stage('light', log_path=log_path):
+            pass
+
+    log = load_run_log(log_path).set_index('stage')
+    # L'aumento della fase pesante è misurato rispetto alla memoria residente prima della fase,
+    # anche se il processo aveva già raggiunto un picco più alto
+    assert abs(log.loc['heavy', 'start_rss_mb'] - before) < 16
+    assert 56 < log.loc['heavy', 'peak_rss_increase_mb'] < 96
+    assert log.loc['light', 'peak_rss_increase_mb'] < 16
+    # La fase esterna vede anche il picco della fase annidata
+    assert log.loc['outer', 'peak_rss_increase_mb'] > 56
+    # Il picco del processo non scende
+    assert log.loc['heavy', 'process_peak_rss_mb'] >= before + 56
+    assert log.loc['light', 'process_peak_rss_mb'] >= log.loc['heavy', 'process_peak_rss_mb']
+    assert 'peak_rss_mb' not in log.columns
+
+
+# Il riepilogo legge anche le righe registrate con il vecchio campo peak_rss_mb
+def test_summary_reads_old_log_rows(tmp_path):
+    log_path = tmp_path / 'run_log.jsonl'
+    row = {'run_id': 'vecchia', 'pid': 1, 'stage': 'fit', 'season': 2020, 'rows': 10,
+           'wall_seconds': 1.0, 'cpu_seconds': 1.0, 'peak_rss_mb': 100.0}
+    log_path.write_text(json.dumps(row) + '\n')
+    summary = summarize_run(str(log_path), summary_path=None)
+    assert summary.loc[0, 'process_peak_rss_mb'] == 100.0
+    assert np.isnan(summary.loc[0, 'peak_rss_increase_mb'])
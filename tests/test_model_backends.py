@@ -0,0 +1,20 @@
+import numpy as np
+from feature_stream import race_chunks, stream_features
+from model_backends import BACKENDS, backend_of, keeps_missing, make_backend
+
+# Feature usate dal modello (come MODEL_FEATURES in algoritmo5BEST.py)
+FEATURES = ['grid', 'previous_position', 'avg_last_10_positions', 'avg_positions_gained']
+
+
+# Il gradient boosting riceve le feature con i NaN, la foresta le riceve riempite con 0
+def test_only_hist_gb_keeps_missing_values(race_results):
+    for name in BACKENDS:
+        data = next(stream_features(race_chunks([race_results], races_per_chunk=100),
+                                    fill_missing=not keeps_missing(name)))
+        X = data[FEATURES]
+        assert X.isna().to_numpy().any() == (name == 'hist_gb')
+
+        pipeline, _ = make_backend(name)
+        pipeline.fit(X, data['positionOrder'].fillna(0))
+        assert np.isfinite(pipeline.predict(X)).all()
+        assert backend_of(pipeline) == name
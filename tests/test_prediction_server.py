@@ -0,0 +1,86 @@
+import http.client
+import json
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from feature_store import FeatureStore
+from model_backends import make_backend
+from prediction_server import MODEL_FEATURES, MicroBatcher, PredictionHandler, PredictionHTTPServer, PredictionModels
+
+
+# Modello che fallisce durante la predizione, per l'errore rilanciato dal micro-batch
+class BrokenModel:
+    def predict(self, X):
+        raise RuntimeError('modello non disponibile')
+
+
+# Server in ascolto su una porta libera, con lo store del dataset sintetico, un modello per il 2020
+# e uno che fallisce per il 2021
+@pytest.fixture
+def server(race_results):
+    rng = np.random.default_rng(0)
+    model, _ = make_backend('random_forest')
+    model.set_params(model__n_estimators=5)
+    model.fit(pd.DataFrame(rng.random((50, len(MODEL_FEATURES))), columns=MODEL_FEATURES), rng.random(50))
+
+    models = PredictionModels.__new__(PredictionModels)
+    models.store = FeatureStore()
+    models.store.update_frame(race_results)
+    models.models = {2020: model, 2021: BrokenModel()}
+    models.latest = 2020
+    handler = type('Handler', (PredictionHandler,), {'models': models, 'batcher': MicroBatcher(models)})
+    server = PredictionHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Funzione per inviare una richiesta POST e leggere stato e risposta JSON
+def post(server, path, body):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    payload = body if isinstance(body, str) else json.dumps(body)
+    connection.request('POST', path, payload, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    status, result = response.status, json.loads(response.read())
+    connection.close()
+    return status, result
+
+
+def test_valid_requests(server):
+    status, result = post(server, '/predict', {'grid': {'1': 1, '2': 2, '3': 3}})
+    assert status == 200 and len(result['predictions']) == 3
+    status, result = post(server, '/whatif', {'grid': {'1': 1, '2': 2}, 'variations': [{'1': 2}], 'season': 2020})
+    assert status == 200 and len(result['predictions']) == 4
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/predict', 'non è json'),
+    ('/predict', ['1', '2']),
+    ('/predict', {'grid': [1, 2, 3]}),
+    ('/predict', {'grid': {}}),
+    ('/predict', {'grid': {'pilota': 1}}),
+    ('/predict', {'grid': {'1': 'primo'}}),
+    ('/predict', {'grid': {'1': None}}),
+    ('/predict', {'grid': {'1': 1}, 'season': [2020]}),
+    ('/predict', {'grid': {'1': 1}, 'season': 1990}),
+    ('/whatif', {'grid': {'1': 1}}),
+    ('/whatif', {'grid': {'1': 1}, 'variations': {'1': 2}}),
+    ('/whatif', {'grid': {'1': 1}, 'variations': [[2]]}),
+    ('/whatif', {'grid': {'1': 1}, 'variations': [{'9': 2}]}),
+])
+def test_malformed_requests_get_400(server, path, body):
+    status, result = post(server, path, body)
+    assert status == 400
+    assert result['error']
+
+
+# Un errore imprevisto del modello arriva dal micro-batch e riceve comunque una risposta JSON
+def test_unexpected_errors_get_500(server):
+    status, result = post(server, '/predict', {'grid': {'1': 1, '2': 2}, 'season': 2021})
+    assert status == 500
+    assert 'RuntimeError' in result['error']
+    # Il server continua a rispondere alle richieste successive
+    assert post(server, '/predict', {'grid': {'1': 1}})[0] == 200
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from race_features import HISTORY_FEATURES, build_history_features
+
+
+# Versione riga per riga originale (da try/algoritmo4.py), usata come riferimento: per ogni riga
+# considera solo le gare con raceId strettamente minore
+def last_10_races_performance(data, driver_id):
+    last_10_races = data[data['driverId'] == driver_id].sort_values(by='raceId', ascending=False).head(10)
+    avg_position = last_10_races['positionOrder'].mean()
+    return avg_position if not np.isnan(avg_position) else 0
+
+def track_performance(data, driver_id, circuit_id):
+    track_races = data[(data['driverId'] == driver_id) & (data['circuitId'] == circuit_id) & (data['positionOrder'].notna())]
+    avg_position = track_races['positionOrder'].mean()
+    wins = (track_races['positionOrder'] == 1).sum()
+    podiums = (track_races['positionOrder'] <= 3).sum()
+    return avg_position if not np.isnan(avg_position) else 0, wins, podiums
+
+def positions_gained_lost(data, driver_id):
+    positions = data[data['driverId'] == driver_id].copy()
+    positions['gained_lost'] = positions['grid'] - positions['positionOrder']
+    avg_gained_lost = positions['gained_lost'].mean()
+    return avg_gained_lost if not np.isnan(avg_gained_lost) else 0
+
+def build_history_features_rowwise(data):
+    features = pd.DataFrame(index=data.index)
+    features['last_10_avg_position'] = data.apply(lambda row: last_10_races_performance(data[data['raceId'] < row['raceId']], row['driverId']), axis=1)
+    features['track_avg_position'], features['track_wins'], features['track_podiums'] = zip(*data.apply(lambda row: track_performance(data[data['raceId'] < row['raceId']], row['driverId'], row['circuitId']), axis=1))
+    features['avg_gained_lost'] = data.apply(lambda row: positions_gained_lost(data[data['raceId'] < row['raceId']], row['driverId']), axis=1)
+    return features[HISTORY_FEATURES]
+
+
+# Il motore vettorizzato deve dare gli stessi valori della versione riga per riga
+def test_matches_rowwise_reference(race_results):
+    fast = build_history_features(race_results)
+    slow = build_history_features_rowwise(race_results)
+    for col in HISTORY_FEATURES:
+        np.testing.assert_allclose(fast[col].to_numpy(dtype=float), slow[col].to_numpy(dtype=float),
+                                   rtol=0, atol=1e-9, err_msg=col)
+
+
+# Le righe vengono restituite nell'ordine e con l'indice dei dati ricevuti, anche se non ordinati per gara
+def test_keeps_input_order(race_results):
+    shuffled = race_results.sample(frac=1, random_state=0)
+    expected = build_history_features(race_results).loc[shuffled.index]
+    pd.testing.assert_frame_equal(build_history_features(shuffled), expected)
+
+
+def test_subset_of_features(race_results):
+    subset = build_history_features(race_results, ['track_wins', 'avg_gained_lost'])
+    pd.testing.assert_frame_equal(subset, build_history_features(race_results)[['track_wins', 'avg_gained_lost']])
+
+
+def test_rejects_duplicate_driver_in_race(race_results):
+    with pytest.raises(ValueError):
+        build_history_features(pd.concat([race_results, race_results.iloc[:1]]))
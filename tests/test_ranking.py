@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+from ranking import rank_within_races
+
+
+# Il lexsort deve dare lo stesso ordine di groupby('raceId').rank(method='first'), anche a parità di punteggio
+# (vince la riga che viene prima) e con le righe delle gare mescolate
+def test_matches_groupby_rank_first_with_ties():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'raceId': rng.integers(1, 30, size=600),
+        # Pochi valori distinti, così ogni gara ha molte parità
+        'predicted_positionOrder': rng.integers(1, 8, size=600) + rng.choice([0, 0.5, -0.25], size=600),
+    })
+    expected = data.groupby('raceId')['predicted_positionOrder'].rank(method='first').astype(np.int64)
+    ranks = rank_within_races(data['raceId'].to_numpy(), data['predicted_positionOrder'].to_numpy())
+    np.testing.assert_array_equal(ranks, expected.to_numpy())
+
+
+def test_tie_order_follows_rows():
+    race_ids = np.array([7, 3, 7, 3, 7, 3])
+    scores = np.array([2.0, 1.0, 2.0, 1.0, 1.0, 0.5])
+    np.testing.assert_array_equal(rank_within_races(race_ids, scores), [2, 2, 3, 3, 1, 1])
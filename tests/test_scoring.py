@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from scoring import calculate_points, points_for_positions, predicted_points
+
+
+# Vecchia catena if/elif copiata negli script (da algoritmo5BEST.py e report.py), usata come riferimento
+def old_calculate_points(position):
+    if position == 1:
+        return 25
+    elif position == 2:
+        return 18
+    elif position == 3:
+        return 15
+    elif position == 4:
+        return 12
+    elif position == 5:
+        return 10
+    elif position == 6:
+        return 8
+    elif position == 7:
+        return 6
+    elif position == 8:
+        return 4
+    elif position == 9:
+        return 2
+    elif position == 10:
+        return 1
+    else:
+        return 0
+
+
+# Posizioni valide, fuori dalla zona punti, non valide e frazionarie
+POSITIONS = list(range(-1, 26)) + [np.nan, np.inf, 3.4, 9.99, 10.5]
+
+
+def test_lookup_matches_old_chain():
+    expected = [old_calculate_points(position) for position in POSITIONS]
+    np.testing.assert_array_equal(points_for_positions(POSITIONS), expected)
+    assert [calculate_points(position) for position in POSITIONS] == expected
+
+
+def test_fastest_lap_point_only_in_top_10():
+    positions = np.array([1, 10, 11, 5, np.nan])
+    points = points_for_positions(positions, fastest_lap=[True, True, True, False, True])
+    np.testing.assert_array_equal(points, [26, 2, 0, 10, 0])
+    # Un booleano vale per tutte le righe
+    np.testing.assert_array_equal(points_for_positions([1, 2], fastest_lap=True), [26, 19])
+
+
+def test_sprint_rows_use_sprint_table_without_fastest_lap():
+    positions = np.array([1, 1, 8, 9, 3])
+    sprint = np.array([True, False, True, True, False])
+    points = points_for_positions(positions, sprint=sprint, fastest_lap=True)
+    np.testing.assert_array_equal(points, [8, 26, 1, 0, 16])
+    np.testing.assert_array_equal(points_for_positions([1, 2, 3, 4], sprint=True, sprint_system='sprint_2021'),
+                                  [3, 2, 1, 0])
+
+
+def test_half_points():
+    points = points_for_positions([1, 2, 10, 11], half_points=[True, False, True, True])
+    np.testing.assert_array_equal(points, [12.5, 18, 0.5, 0])
+    np.testing.assert_array_equal(points_for_positions([1, 9], system='2003', half_points=True), [5, 0])
+
+
+# Le posizioni predette frazionarie vengono prima ordinate in ogni gara (a parità vince la prima riga)
+def test_fractional_predictions_are_ranked_within_races():
+    data = pd.DataFrame({
+        'raceId': [1, 1, 1, 2, 2, 2],
+        'predicted_positionOrder': [3.4, 1.2, 2.8, 5.2, 5.2, 0.5],
+    })
+    np.testing.assert_array_equal(predicted_points(data), [15, 25, 18, 18, 15, 25])
+    # Con la vecchia funzione le stesse posizioni frazionarie non valevano punti
+    assert [old_calculate_points(position) for position in data['predicted_positionOrder']] == [0] * 6
@@ -0,0 +1,38 @@
+import numpy as np
+from scoring import points_table
+from season_simulator import simulate_chunk
+
+
+# Ogni gara simulata deve distribuire esattamente i punti della tabella: con 20 piloti
+# le posizioni dall'undicesima in giù non prendono punti
+def test_each_race_totals_table_sum():
+    n_races, n_drivers, n_constructors = 3, 20, 10
+    mean = np.tile(np.arange(1, n_drivers + 1, dtype=np.float32), (n_races, 1))
+    std = np.full((n_races, n_drivers), 2.0, dtype=np.float32)
+    present = np.ones((n_races, n_drivers), dtype=bool)
+    constructor = np.tile(np.arange(n_drivers) // 2, (n_races, 1))
+    n_sims = 50
+
+    (_, _, driver_points), (_, _, constructor_points) = simulate_chunk(
+        mean, std, present, constructor, n_constructors, n_sims, seed=0)
+
+    expected = points_table().sum() * n_races * n_sims
+    assert expected == 101 * n_races * n_sims
+    assert driver_points.sum() == expected
+    assert constructor_points.sum() == expected
+
+
+# Con meno piloti delle posizioni a punti, la gara distribuisce solo i punti delle posizioni occupate
+def test_short_grid_and_absent_drivers():
+    n_races, n_drivers = 2, 6
+    mean = np.tile(np.arange(1, n_drivers + 1, dtype=np.float32), (n_races, 1))
+    std = np.zeros((n_races, n_drivers), dtype=np.float32)
+    present = np.ones((n_races, n_drivers), dtype=bool)
+    present[1, 5] = False
+    constructor = np.zeros((n_races, n_drivers), dtype=np.int64)
+
+    (_, _, driver_points), _ = simulate_chunk(mean, std, present, constructor, 1, 1, seed=0)
+
+    table = points_table()
+    assert driver_points.sum() == table[1:7].sum() + table[1:6].sum()
+    assert driver_points[5] == table[6]
@@ -3,9 +3,17 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 import numpy as np
 import os
+import sys
 
-# Carica i dati
-data = pd.read_csv('final_data_sorted.csv')
+# Rende importabili i moduli nella cartella principale del progetto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_layer import load_dataset
+from scoring import predicted_points
+
+# Carica i dati (solo le colonne usate per le feature, i nomi dei piloti, i punti dei costruttori
+# e quelle lette dagli script di accuratezza)
+data = load_dataset(columns=['raceId', 'raceName', 'year', 'driverId', 'driverForename', 'driverSurname',
+                             'constructorId', 'grid', 'positionOrder', 'resultPoints', 'laps'])
 
 # Elenco dei piloti per il 2024
 drivers_2024 = [
@@ -17,7 +25,7 @@ drivers_2024 = [
 
 # Mappa dei nomi dei piloti ai loro ID
 driver_names = data[['driverId', 'driverForename', 'driverSurname']].drop_duplicates()
-driver_names['fullName'] = driver_names['driverForename'] + ' ' + driver_names['driverSurname']
+driver_names['fullName'] = driver_names['driverForename'].astype(str) + ' ' + driver_names['driverSurname'].astype(str)
 
 # Filtra solo i driverId dei piloti che gareggeranno nel 2024
 driver_ids_2024 = driver_names[driver_names['fullName'].isin(drivers_2024)]['driverId'].unique()
@@ -64,31 +72,6 @@ def train_and_predict(train_data, test_data, target_col):
     
     return y_pred
 
-# Calcolo dei punti in base alla posizione predetta
-def calculate_points(position):
-    if position == 1:
-        return 25
-    elif position == 2:
-        return 18
-    elif position == 3:
-        return 15
-    elif position == 4:
-        return 12
-    elif position == 5:
-        return 10
-    elif position == 6:
-        return 8
-    elif position == 7:
-        return 6
-    elif position == 8:
-        return 4
-    elif position == 9:
-        return 2
-    elif position == 10:
-        return 1
-    else:
-        return 0
-
 # Predizione per ogni anno dal 2018 al 2024
 predictions = []
 years = range(2018, 2025)  # Include il 2024
@@ -106,7 +89,7 @@ for year in years:
     test_data['predicted_positionOrder'] = train_and_predict(train_data, test_data, 'positionOrder')
     
     # Calcola i punti in base alle posizioni predette
-    test_data['predicted_resultPoints'] = test_data['predicted_positionOrder'].apply(calculate_points)
+    test_data['predicted_resultPoints'] = predicted_points(test_data)
     
     # Calcola i punti per i costruttori
     constructor_points = test_data.groupby('constructorId')['predicted_resultPoints'].sum().reset_index()
@@ -2,10 +2,21 @@ import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 import numpy as np
 import os
-import time
+import sys
 
-# Carica i dati
-data = pd.read_csv('final_data_sorted.csv')
+# Rende importabili i moduli nella cartella principale del progetto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_layer import load_dataset
+from feature_cache import feature_frame
+from race_features import HISTORY_COLUMNS
+from scoring import predicted_points
+from instrumentation import stage, summarize_run
+
+# Carica i dati: le colonne delle caratteristiche storiche, quelle per i punti dei costruttori
+# e quelle lette dagli script di accuratezza
+with stage('load') as record:
+    data = load_dataset(columns=HISTORY_COLUMNS + ['year', 'raceName', 'constructorId'])
+    record['rows'] = len(data)
 
 # Funzione per preparare i dati per un anno specifico
 def prepare_data_for_year(data, year):
@@ -17,45 +28,19 @@ def prepare_data_for_year(data, year):
     
     return train_data, test_data
 
-# Funzione per calcolare le prestazioni nelle ultime 10 gare
-def last_10_races_performance(data, driver_id):
-    last_10_races = data[data['driverId'] == driver_id].sort_values(by='raceId', ascending=False).head(10)
-    avg_position = last_10_races['positionOrder'].mean()
-    return avg_position
-
-# Funzione per calcolare le prestazioni su una pista specifica
-def track_performance(data, driver_id, circuit_id):
-    track_races = data[(data['driverId'] == driver_id) & (data['circuitId'] == circuit_id) & (data['positionOrder'].notna())]
-    avg_position = track_races['positionOrder'].mean()
-    wins = (track_races['positionOrder'] == 1).sum()
-    podiums = (track_races['positionOrder'] <= 3).sum()
-    return avg_position, wins, podiums
-
-# Funzione per calcolare le posizioni guadagnate o perse
-def positions_gained_lost(data, driver_id):
-    positions = data[data['driverId'] == driver_id].copy()
-    positions['gained_lost'] = positions['grid'] - positions['positionOrder']
-    avg_gained_lost = positions['gained_lost'].mean()
-    return avg_gained_lost
-
 # Funzione per creare le feature e le etichette
-def create_features_and_labels(data, target_col):
-    features = data[['grid']].copy()
-    data['previous_position'] = data.groupby('driverId')['positionOrder'].shift(1)
-    features['previous_position'] = data['previous_position']
-    
-    features['last_10_avg_position'] = data['driverId'].apply(lambda x: last_10_races_performance(data[data['raceId'] < x], x))
-    features['track_avg_position'], features['track_wins'], features['track_podiums'] = zip(*data.apply(lambda row: track_performance(data[data['raceId'] < row['raceId']], row['driverId'], row['circuitId']), axis=1))
-    features['avg_gained_lost'] = data['driverId'].apply(lambda x: positions_gained_lost(data[data['raceId'] < x], x))
-    
-    features.fillna(0, inplace=True)  # Riempie i valori NaN con 0
+def create_features_and_labels(data, target_col, year, part):
+    # Matrice delle feature (con le caratteristiche storiche, solo gare con raceId precedente) letta dalla cache
+    # delle matrici: viene ricalcolata solo se cambiano i dati o il codice delle feature (NaN già sostituiti con 0)
+    with stage('features', rows=len(data)):
+        features = feature_frame(data, 'history', year, part)
     labels = data[target_col]
     return features, labels
 
 # Funzione per addestrare e prevedere con un modello, e calcolare l'importanza delle caratteristiche
-def train_and_predict(train_data, test_data, target_col, n_estimators=100):
-    X_train, y_train = create_features_and_labels(train_data, target_col)
-    X_test, _ = create_features_and_labels(test_data, target_col)
+def train_and_predict(train_data, test_data, target_col, year, n_estimators=100):
+    X_train, y_train = create_features_and_labels(train_data, target_col, year, 'train')
+    X_test, _ = create_features_and_labels(test_data, target_col, year, 'test')
     
     # Addestra il modello di RandomForest
     model = RandomForestRegressor(n_estimators=n_estimators, max_features='sqrt', max_depth=20, min_samples_split=2, min_samples_leaf=1)
@@ -75,31 +60,6 @@ def train_and_predict(train_data, test_data, target_col, n_estimators=100):
     
     return y_pred, feature_importances
 
-# Calcolo dei punti in base alla posizione predetta
-def calculate_points(position):
-    if position == 1:
-        return 25
-    elif position == 2:
-        return 18
-    elif position == 3:
-        return 15
-    elif position == 4:
-        return 12
-    elif position == 5:
-        return 10
-    elif position == 6:
-        return 8
-    elif position == 7:
-        return 6
-    elif position == 8:
-        return 4
-    elif position == 9:
-        return 2
-    elif position == 10:
-        return 1
-    else:
-        return 0
-
 # Predizione per ogni anno dal 2018 al 2023
 predictions = []
 years = range(2018, 2024)  # Include fino al 2023
@@ -115,14 +75,14 @@ for year in years:
         continue
     
     # Prevedi le posizioni e calcola l'importanza delle caratteristiche
-    start_time = time.time()
-    test_data['predicted_positionOrder'], feature_importances = train_and_predict(train_data, test_data, 'positionOrder', n_estimators=100)
+    with stage('train_predict', season=year, rows=len(train_data) + len(test_data)) as record:
+        test_data['predicted_positionOrder'], feature_importances = train_and_predict(train_data, test_data, 'positionOrder', year, n_estimators=100)
     feature_importances_list.append(feature_importances)
-    end_time = time.time()
-    print(f"Anno {year}: Tempo di esecuzione per il training e predizione: {end_time - start_time:.2f} secondi")
+    print(f"Anno {year}: Tempo di esecuzione per il training e predizione: {record['wall_seconds']:.2f} secondi")
     
     # Calcola i punti in base alle posizioni predette
-    test_data['predicted_resultPoints'] = test_data['predicted_positionOrder'].apply(calculate_points)
+    with stage('scoring', season=year, rows=len(test_data)):
+        test_data['predicted_resultPoints'] = predicted_points(test_data)
     
     # Calcola i punti per i costruttori
     constructor_points = test_data.groupby('constructorId')['predicted_resultPoints'].sum().reset_index()
@@ -160,3 +120,6 @@ if feature_importances_list:
     features_list = ['grid', 'previous_position', 'last_10_avg_position', 'track_avg_position', 'track_wins', 'track_podiums', 'avg_gained_lost']
     for feature, importance in zip(features_list, avg_feature_importances):
         print(f"{feature}: {importance}")
+
+# Tempo, CPU e memoria di ogni fase dell'esecuzione
+print(summarize_run().to_string(index=False))
@@ -1,6 +1,8 @@
-import pandas as pd
-import numpy as np
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import evaluate_files, per_race_view, summary_view
 
 # Carica i dati delle predizioni
 files = [
@@ -9,44 +11,13 @@ files = [
     'predicted_results5.csv'
 ]
 
-# Leggi i file
-data_frames = [pd.read_csv(file) for file in files]
-
-# Unisci tutti i dati in un unico DataFrame per selezionare il 20% delle gare casualmente
-all_data = pd.concat(data_frames)
-
-# Ottieni una lista unica di gare
-unique_races = all_data[['raceId', 'raceName', 'year']].drop_duplicates()
-
-# Seleziona il 20% delle gare casualmente
-sample_size = int(0.2 * len(unique_races))
-sample_races = unique_races.sample(n=sample_size, random_state=42)
-
-# Filtra i dati per le gare selezionate
-sample_data_frames = [df[df['raceId'].isin(sample_races['raceId'])] for df in data_frames]
-
-# Funzione per calcolare la differenza media tra predizione e realtà
-def evaluate_predictions(df):
-    if 'predicted_positionOrder' in df.columns:
-        df = df.copy()  # Evita l'errore SettingWithCopyWarning
-        df['position_diff'] = abs(df['positionOrder'] - df['predicted_positionOrder'])
-        mean_diff = df.groupby(['raceId', 'raceName', 'year'])['position_diff'].mean().reset_index()
-        return mean_diff
-    else:
-        return None
-
-# Calcola la differenza media per ogni predizione
-results = [evaluate_predictions(df) for df in sample_data_frames]
-
-# Combina i risultati in un unico DataFrame per visualizzare l'accuratezza media per gara
-combined_results = pd.concat(results, keys=[f'Prediction {i+3}' for i in range(len(results))], names=['Prediction', 'Index'])
-
-# Calcola l'accuratezza media per ogni gara e ogni predizione
-accuracy_per_race = combined_results.groupby(['raceId', 'raceName', 'year', 'Prediction'])['position_diff'].mean().unstack()
+# Calcola le metriche di tutti i modelli in un solo passaggio, sul 20% delle gare scelto a caso
+# (senza escludere outlier)
+metrics_per_race, metrics_summary = evaluate_files(files, fraction=0.2, random_state=42, outlier_threshold=None)
 
-# Calcola l'accuratezza media finale per ogni predizione
-final_accuracy_summary = combined_results.groupby('Prediction')['position_diff'].mean().reset_index()
-final_accuracy_summary.rename(columns={'position_diff': 'mean_position_diff'}, inplace=True)
+# Accuratezza media per ogni gara e ogni predizione, e accuratezza media finale per ogni predizione
+accuracy_per_race = per_race_view(metrics_per_race)
+final_accuracy_summary = summary_view(metrics_summary)
 
 # Funzione per colorare le celle in base ai valori
 def color_cells(val):
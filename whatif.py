@@ -0,0 +1,86 @@
+import pandas as pd
+import numpy as np
+from algoritmo5BEST import MODEL_FEATURES
+from data_layer import load_dataset
+from ranking import rank_within_races
+from scoring import points_for_positions
+
+
+# Funzione per leggere la griglia di partenza di una gara del dataset come dizionario {driverId: grid}
+def race_grid(race_id):
+    race = load_dataset(columns=['raceId', 'driverId', 'grid'], race_ids=[race_id])
+    return dict(zip(race['driverId'].astype(int), race['grid'].astype(int)))
+
+
+# Funzione per spostare un pilota in un'altra posizione di partenza, scambiandolo con chi la occupa
+def move_driver(base_grid, driver_id, position):
+    grid = dict(base_grid)
+    for other, other_position in base_grid.items():
+        if other_position == position:
+            grid[other] = base_grid[driver_id]
+    grid[driver_id] = position
+    return grid
+
+
+# Funzione per generare le varianti con un pilota spostato in ognuna delle posizioni indicate (tutte se None)
+def driver_variations(base_grid, driver_id, positions=None):
+    positions = range(1, len(base_grid) + 1) if positions is None else positions
+    return [move_driver(base_grid, driver_id, position) for position in positions]
+
+
+# Funzione per valutare molte varianti della griglia di una gara con una sola predizione (predict, se indicata,
+# sostituisce la predict del modello della stagione, es. quella a micro-batch del server).
+# Le caratteristiche storiche di ogni pilota vengono calcolate una volta e ripetute per ogni scenario,
+# cambia solo la colonna grid. Lo scenario 0 è la griglia di partenza base; per ogni scenario e pilota
+# restituisce ordine d'arrivo e punti predetti e la differenza rispetto allo scenario base
+def whatif(models, base_grid, variations, year=None, predict=None):
+    year = models.latest if year is None else int(year)
+    predict = predict or models.models[year].predict
+
+    driver_ids, base_features = models.features_for_grid(base_grid, year)
+    n_drivers = len(driver_ids)
+    scenarios = [base_grid] + list(variations)
+    n_scenarios = len(scenarios)
+
+    # Matrice (scenari x piloti) delle posizioni di partenza, nell'ordine dei piloti della griglia base.
+    # Una variante può indicare solo i piloti che cambiano posizione
+    keys = list(base_grid)
+    grids = np.array([[scenario.get(key, base_grid[key]) for key in keys] for scenario in scenarios], dtype=float)
+
+    features = pd.DataFrame(np.tile(base_features.to_numpy(), (n_scenarios, 1)), columns=MODEL_FEATURES)
+    features['grid'] = grids.ravel()
+    predicted = predict(features)
+
+    scenario_ids = np.repeat(np.arange(n_scenarios), n_drivers)
+    ranks = rank_within_races(scenario_ids, predicted)
+    points = points_for_positions(ranks)
+    base_ranks = np.tile(ranks[:n_drivers], n_scenarios)
+    base_points = np.tile(points[:n_drivers], n_scenarios)
+
+    return pd.DataFrame({
+        'scenario': scenario_ids,
+        'driverId': np.tile(driver_ids, n_scenarios),
+        'grid': features['grid'].to_numpy(),
+        'predicted_positionOrder': predicted,
+        'predicted_rank': ranks,
+        'predicted_points': points,
+        'rank_delta': ranks - base_ranks,
+        'points_delta': points - base_points,
+    })
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from prediction_server import PredictionModels
+
+    # Esempio: tutte le posizioni di partenza possibili per ogni pilota dell'ultima gara del dataset
+    race_id = int(sys.argv[1]) if len(sys.argv) > 1 else int(load_dataset(columns=['raceId'])['raceId'].max())
+    models = PredictionModels()
+    base_grid = race_grid(race_id)
+    variations = [grid for driver_id in base_grid for grid in driver_variations(base_grid, driver_id)]
+
+    start_time = time.perf_counter()
+    results = whatif(models, base_grid, variations)
+    print(f"Gara {race_id}: {len(variations)} scenari valutati in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    print(results[results['driverId'] == next(iter(base_grid))].head(25).to_string(index=False))